@@ -42,10 +42,20 @@
 """
 __version__ = "1.3"
 
+import os
+import re
 import sys
+import mmap
 import time
 import calendar
-
+import locale
+import itertools
+import math
+import operator
+import bisect
+import struct
+
+from array import array
 from functools import total_ordering
 from datetime import datetime, date, timedelta
 
@@ -65,6 +75,318 @@ def is_number(value):
     else:
         return isinstance(value, (float, int, long))
 
+# Tick arithmetic. A tick is one microsecond of wall-clock time counted from
+# 1970-01-01 00:00:00, i.e. the same naive local time that a Date wraps, so
+# calendar fields can be decoded from it without any time zone lookups.
+def _get_tick_typecode():
+    # Python 2 has no "q" typecode, but its "l" is 64-bit on most platforms
+    for typecode in ("q", "l"):
+        try:
+            if array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            pass
+    return "q"
+
+_TICK_TYPECODE = _get_tick_typecode()
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_US_PER_SECOND = 1000000
+_US_PER_MINUTE = 60 * _US_PER_SECOND
+_US_PER_HOUR = 60 * _US_PER_MINUTE
+_US_PER_DAY = 24 * _US_PER_HOUR
+
+def _datetime_to_ticks(dt):
+    return (((dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 +
+             dt.minute * 60 + dt.second) * _US_PER_SECOND + dt.microsecond)
+
+def _ticks_to_datetime(ticks):
+    return _EPOCH + timedelta(microseconds=ticks)
+
+def _timedelta_to_ticks(value):
+    return ((value.days * 86400 + value.seconds) * _US_PER_SECOND +
+            value.microseconds)
+
+_MIN_TICKS = _datetime_to_ticks(datetime.min)
+_MAX_TICKS = _datetime_to_ticks(datetime.max)
+
+def _civil_to_days(year, month, day):
+    """
+        Get the number of days since 1970-01-01 of a date in the proleptic
+        Gregorian calendar, using only integer arithmetic so that any year
+        works. See http://howardhinnant.github.io/date_algorithms.html
+    """
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + \
+                 day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def _days_to_civil(days):
+    """
+        Get the (year, month, day) of a number of days since 1970-01-01,
+        the inverse of L{_civil_to_days}.
+    """
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 -
+                   day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 -
+                                year_of_era // 100)
+    month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month + 2) // 5 + 1
+    month += 3 if month < 10 else -9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+def _civil_to_seconds(year, month, day, hour, minute, second):
+    return ((_civil_to_days(year, month, day) * 24 + hour) * 60 +
+            minute) * 60 + second
+
+# Calendar periods which dates can be bucketed into. Each period has an
+# integer id: days or weeks since 1970-01-01 (weeks start on Monday, and
+# 1970-01-01 was a Thursday), months or quarters since year 0, or the year.
+_PERIODS = ("day", "week", "month", "quarter", "year")
+
+def _days_to_period(days, period):
+    """
+        Get the id of the period containing a number of days since
+        1970-01-01.
+    """
+    if period == "day":
+        return days
+    elif period == "week":
+        return (days + 3) // 7
+
+    year, month = _days_to_civil(days)[:2]
+
+    if period == "month":
+        return year * 12 + month - 1
+    elif period == "quarter":
+        return year * 4 + (month - 1) // 3
+    elif period == "year":
+        return year
+
+    raise ValueError("Invalid period %r!" % period)
+
+def _period_to_days(value, period):
+    """
+        Get the first day of a period as a number of days since 1970-01-01,
+        the inverse of L{_days_to_period}.
+    """
+    if period == "day":
+        return value
+    elif period == "week":
+        return value * 7 - 3
+    elif period == "month":
+        year, month = divmod(value, 12)
+        return _civil_to_days(year, month + 1, 1)
+    elif period == "quarter":
+        year, quarter = divmod(value, 4)
+        return _civil_to_days(year, quarter * 3 + 1, 1)
+    elif period == "year":
+        return _civil_to_days(value, 1, 1)
+
+    raise ValueError("Invalid period %r!" % period)
+
+class _LocalZone(object):
+    """
+        Converts between Unix timestamps and local wall-clock time with
+        plain arithmetic. The UTC offset of each day is looked up once via
+        time.localtime and cached, together with the exact second of any
+        offset change (e.g. daylight saving time) during that day. The cache
+        is dropped whenever time.tzset() is called.
+
+        Days which time.localtime can't handle on this platform (e.g. past
+        2038 with a 32-bit time_t) use the offset of the same day and time
+        in a proxy year between 1971 and 2037 which has the same calendar.
+    """
+    _MAX_DAYS = 100000
+
+    def __init__(self):
+        self._days = {}
+        self._tzname = None
+        self._proxy_years = {}
+
+        for year in range(1971, 2038):
+            self._proxy_years[self._get_calendar(year)] = year
+
+    @staticmethod
+    def _get_calendar(year):
+        # Years with the same leap day and weekday of January 1st share
+        # the same calendar; 1970-01-01 was a Thursday.
+        return calendar.isleap(year), (_civil_to_days(year, 1, 1) + 3) % 7
+
+    def _get_offset(self, seconds):
+        try:
+            tm = time.localtime(seconds)
+        except (OverflowError, OSError, ValueError):
+            return self._get_proxy_offset(seconds)
+        return _civil_to_seconds(*tm[:6]) - seconds
+
+    def _get_proxy_offset(self, seconds):
+        year = _days_to_civil(seconds // 86400)[0]
+        proxy = self._proxy_years[self._get_calendar(year)]
+        shift = (_civil_to_days(proxy, 1, 1) -
+                 _civil_to_days(year, 1, 1)) * 86400
+
+        try:
+            tm = time.localtime(seconds + shift)
+        except (OverflowError, OSError, ValueError):
+            return -time.timezone
+        return _civil_to_seconds(*tm[:6]) - seconds - shift
+
+    def _get_day(self, day):
+        if len(self._days) >= self._MAX_DAYS:
+            self._days.clear()
+
+        start = day * 86400
+        before = self._get_offset(start)
+        after = self._get_offset(start + 86399)
+        split = None
+
+        if before != after:
+            # Find the first second of the new offset
+            low, high = start, start + 86399
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._get_offset(middle) == before:
+                    low = middle
+                else:
+                    high = middle
+            split = high
+
+        value = self._days[day] = (split, before, after)
+        return value
+
+    def utcoffset(self, seconds):
+        """
+            Get the local UTC offset in seconds at a Unix timestamp.
+        """
+        if time.tzname is not self._tzname:
+            self._days.clear()
+            self._tzname = time.tzname
+
+        try:
+            split, before, after = self._days[seconds // 86400]
+        except KeyError:
+            split, before, after = self._get_day(seconds // 86400)
+
+        if split is None or seconds < split:
+            return before
+        return after
+
+    def to_local(self, seconds):
+        """
+            Convert a Unix timestamp in whole seconds to local wall-clock
+            seconds since 1970-01-01 00:00:00.
+        """
+        return seconds + self.utcoffset(seconds)
+
+    def to_utc(self, seconds):
+        """
+            Convert local wall-clock seconds since 1970-01-01 00:00:00 to a
+            Unix timestamp. Ambiguous and skipped wall-clock times are
+            resolved like datetime.timestamp() does for naive datetimes.
+        """
+        utcoffset = self.utcoffset
+        a = utcoffset(seconds)
+        u1 = seconds - a
+        t1 = u1 + utcoffset(u1)
+
+        if t1 == seconds:
+            # Check for an earlier solution during a repeated hour
+            b = utcoffset(u1 - 86400)
+            if a == b:
+                return u1
+        else:
+            b = t1 - u1
+
+        u2 = seconds - b
+        if u2 + utcoffset(u2) == seconds:
+            return u2
+        elif t1 == seconds:
+            return u1
+
+        # A skipped wall-clock time
+        return max(u1, u2)
+
+_local_zone = _LocalZone()
+
+# Timestamps which are in the range of datetime in any time zone
+_MIN_TIMESTAMP = _MIN_TICKS // _US_PER_SECOND + _US_PER_DAY // _US_PER_SECOND
+_MAX_TIMESTAMP = _MAX_TICKS // _US_PER_SECOND - _US_PER_DAY // _US_PER_SECOND
+
+def _timestamp_to_ticks(value):
+    if not _MIN_TIMESTAMP <= value <= _MAX_TIMESTAMP:
+        raise OverflowError("timestamp out of range for datetime")
+
+    if is_number(value) and not isinstance(value, float):
+        return _local_zone.to_local(value) * _US_PER_SECOND
+
+    # Round to microseconds the same way as datetime.fromtimestamp
+    seconds = math.floor(value)
+    microseconds = round((value - seconds) * 1e6)
+    seconds = int(seconds)
+    if microseconds >= _US_PER_SECOND:
+        seconds += 1
+        microseconds -= _US_PER_SECOND
+
+    return _local_zone.to_local(seconds) * _US_PER_SECOND + int(microseconds)
+
+def _ticks_to_timestamp(ticks):
+    return _local_zone.to_utc(ticks // _US_PER_SECOND)
+
+def _days_to_date(days):
+    return date.fromordinal(days + _EPOCH_ORDINAL)
+
+def _date_to_days(value):
+    return value.toordinal() - _EPOCH_ORDINAL
+
+# Days in each month of common and leap years, and whether each year in the
+# range of datetime (plus one on each side) is a leap year
+_DAYS_IN_MONTH = ((0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+                  (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31))
+_LEAP_YEARS = bytearray([calendar.isleap(x) for x in range(10001)])
+
+def _days_in_month(year, month):
+    # Negative years would silently index from the end of the table
+    if not 1 <= year <= 9999:
+        raise ValueError("year %d is out of range" % year)
+    return _DAYS_IN_MONTH[_LEAP_YEARS[year]][month]
+
+def _fields_to_ticks(year, month, day, hour, minute, second, microsecond,
+                     clip_day = False):
+    """
+        Get the ticks of a date from its fields, rolling values which are
+        out of range over like the Date property setters do. If clip_day
+        is set, day is clipped to the last day of the month instead.
+    """
+    year, month = divmod(year * 12 + month - 1, 12)
+    month += 1
+
+    if clip_day:
+        day = min(day, _days_in_month(year, month))
+
+    days = date(year, month, 1).toordinal() - _EPOCH_ORDINAL + day - 1
+    return (days * _US_PER_DAY + hour * _US_PER_HOUR +
+            minute * _US_PER_MINUTE + second * _US_PER_SECOND + microsecond)
+
+
+def _to_microseconds(value, unit):
+    # Integers are kept exact, other numbers are rounded like timedelta
+    if isinstance(value, float):
+        return int(round(value * unit))
+    return int(value * unit)
+
+def _divide(value, unit):
+    # Only the remainder is converted to a float, so large values keep
+    # their precision, and integers never floor-divide on Python 2
+    quotient, remainder = divmod(value, unit)
+    return quotient + remainder / float(unit)
 
 class Delta(object):
     """
@@ -96,8 +418,26 @@ class Delta(object):
             17
             >>> d.total_seconds
             123456.0
-            >>> d.total_hours
-            34.293333333333337
+            >>> round(d.total_hours, 6)
+            34.293333
+
+        Deltas are stored as an exact integer number of microseconds, so
+        setting and adding components never loses precision:
+
+            >>> import random
+            >>> rng = random.Random(1234)
+            >>> units = ["years", "months", "days", "hours", "minutes",
+            ...          "seconds", "microseconds"]
+            >>> for i in range(1000):
+            ...     us = rng.randint(-10 ** 15, 10 ** 15)
+            ...     d = Delta.from_microseconds(us)
+            ...     assert d.td == timedelta(microseconds=us)
+            ...     assert Delta(d.td).total_microseconds == us
+            ...     unit = rng.choice(units)
+            ...     value = getattr(d, unit)
+            ...     setattr(d, unit, value + 7)
+            ...     setattr(d, unit, getattr(d, unit) - 7)
+            ...     assert d.total_microseconds == us, (us, unit)
 
             >>> delta = Date(12345678) - Date(12340000)
             >>> str(delta)
@@ -122,14 +462,16 @@ class Delta(object):
         @type years: int, float, or long
         @param years: The number of years this delta represents
     """
+    __slots__ = ("_us",)
+
     def __init__(self, td = None, years = 0, months = 0, days = 0, hours = 0,
                  minutes = 0, seconds = 0):
         if td is None:
-            self.td = timedelta()
+            us = 0
         elif type(td) is timedelta:
-            self.td = td
+            us = _timedelta_to_ticks(td)
         elif is_number(td):
-            self.td = timedelta(seconds=td)
+            us = _to_microseconds(td, _US_PER_SECOND)
         else:
             raise ValueError("You must pass a valid timedelta object, number " \
                              "of years, months, days, hours, minutes, " \
@@ -138,7 +480,45 @@ class Delta(object):
         days = years * 365 + months * 30 + days
         seconds = hours * 60 * 60 + minutes * 60 + seconds
 
-        self.td = timedelta(days=self.td.days + days, seconds=self.td.seconds + seconds, microseconds=self.td.microseconds)
+        self._us = us + _to_microseconds(days, _US_PER_DAY) + \
+                   _to_microseconds(seconds, _US_PER_SECOND)
+
+    def __reduce__(self):
+        """
+            Pickle this delta as a timedelta, as slots can't be pickled with
+            the older protocols.
+
+                >>> import pickle
+                >>> [pickle.loads(pickle.dumps(Delta(5.5), x)).total_seconds
+                ...  for x in (0, pickle.HIGHEST_PROTOCOL)]
+                [5.5, 5.5]
+        """
+        return (Delta, (timedelta(microseconds=self._us),))
+
+    @classmethod
+    def from_microseconds(cls, value):
+        """
+            Create a new Delta from an integer number of microseconds.
+
+                >>> Delta.from_microseconds(90000001).microseconds
+                1
+
+            @type value: int
+            @param value: The number of microseconds
+            @rtype: Delta
+            @return: A new delta object
+        """
+        delta = cls.__new__(cls)
+        delta._us = value
+        return delta
+
+    def _get_td(self):
+        return timedelta(microseconds=self._us)
+
+    def _set_td(self, value):
+        self._us = _timedelta_to_ticks(value)
+
+    td = property(_get_td, _set_td)
 
     def __repr__(self):
         """
@@ -162,7 +542,7 @@ class Delta(object):
             @rtype: timedelta
             @return: The underlying timedelta
         """
-        return self.td
+        return timedelta(microseconds=self._us)
 
     def _set_timedelta(self, value):
         """
@@ -171,7 +551,7 @@ class Delta(object):
             @type value: timedelta
             @param value: The timedelta object to set
         """
-        self.td = value
+        self._us = _timedelta_to_ticks(value)
 
     timedelta = property(_get_timedelta, _set_timedelta)
 
@@ -212,7 +592,7 @@ class Delta(object):
             @rtype: int
             @return: Number of microseconds
         """
-        return self.td.microseconds
+        return self._us % _US_PER_SECOND
 
     def _set_microseconds(self, value):
         """
@@ -228,8 +608,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of microseconds
         """
-        value -= self.microseconds
-        self.td = timedelta(seconds=self.total_seconds + (value / 1000000.0))
+        self._us += _to_microseconds(value - self.microseconds, 1)
 
     microseconds = property(_get_microseconds, _set_microseconds)
 
@@ -245,7 +624,7 @@ class Delta(object):
             @rtype: float
             @return: Number of microseconds
         """
-        return float(self.td.days * 24 * 60 * 60 * 1000000 + self.td.seconds * 1000000 + self.td.microseconds)
+        return float(self._us)
 
     def _get_seconds(self):
         """
@@ -258,7 +637,7 @@ class Delta(object):
             @rtype: int
             @return: Number of seconds
         """
-        return self.td.seconds % (60 * 60) % 60
+        return self._us // _US_PER_SECOND % 60
 
     def _set_seconds(self, value):
         """
@@ -274,8 +653,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of seconds
         """
-        value -= self.seconds
-        self.td = timedelta(seconds=self.total_seconds + value)
+        self._us += _to_microseconds(value - self.seconds, _US_PER_SECOND)
 
     seconds = property(_get_seconds, _set_seconds)
 
@@ -291,7 +669,7 @@ class Delta(object):
             @rtype: float
             @return: Number of seconds
         """
-        return self.td.days * 24 * 60 * 60 + self.td.seconds + (self.td.microseconds / 1000000.0)
+        return _divide(self._us, _US_PER_SECOND)
 
     def _get_minutes(self):
         """
@@ -304,7 +682,7 @@ class Delta(object):
             @rtype: int
             @return: Number of minutes
         """
-        return self.td.seconds % (60 * 60) // 60
+        return self._us // _US_PER_MINUTE % 60
 
     def _set_minutes(self, value):
         """
@@ -318,8 +696,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of minutes
         """
-        value -= self.minutes
-        self.td = timedelta(seconds=self.total_seconds + (value * 60.0))
+        self._us += _to_microseconds(value - self.minutes, _US_PER_MINUTE)
 
     minutes = property(_get_minutes, _set_minutes)
 
@@ -335,7 +712,7 @@ class Delta(object):
             @rtype: float
             @return: Number of minutes
         """
-        return self.td.days * 24 * 60 + (self.td.seconds / 60.0) + (self.td.microseconds / 1000000.0 / 60.0)
+        return _divide(self._us, _US_PER_MINUTE)
 
     def _get_hours(self):
         """
@@ -348,7 +725,7 @@ class Delta(object):
             @rtype: int
             @return: Number of hours
         """
-        return self.td.seconds // (60 * 60)
+        return self._us // _US_PER_HOUR % 24
 
     def _set_hours(self, value):
         """
@@ -362,8 +739,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of hours
         """
-        value -= self.hours
-        self.td = timedelta(seconds=self.total_seconds + (value * 60.0 * 60.0))
+        self._us += _to_microseconds(value - self.hours, _US_PER_HOUR)
 
     hours = property(_get_hours, _set_hours)
 
@@ -379,7 +755,7 @@ class Delta(object):
             @rtype: float
             @return: Number of hours
         """
-        return self.td.days * 24 + (self.td.seconds / 60.0 / 60.0) + (self.td.microseconds / 1000000.0 / 60.0 / 60.0)
+        return _divide(self._us, _US_PER_HOUR)
 
     def _get_days(self):
         """
@@ -392,7 +768,7 @@ class Delta(object):
             @rtype: int
             @return: Number of days
         """
-        return self.td.days % 365 % 30
+        return self._us // _US_PER_DAY % 365 % 30
 
     def _set_days(self, value):
         """
@@ -406,8 +782,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of days
         """
-        value -= self.days
-        self.td = timedelta(seconds=self.total_seconds + (value * 60.0 * 60 * 24))
+        self._us += _to_microseconds(value - self.days, _US_PER_DAY)
 
     days = property(_get_days, _set_days)
 
@@ -423,7 +798,7 @@ class Delta(object):
             @rtype: float
             @return: Number of days
         """
-        return self.td.days + (self.td.seconds / 24.0 / 60.0 / 60.0) + (self.td.microseconds / 100000.0 / 60.0 / 60.0 / 24.0)
+        return _divide(self._us, _US_PER_DAY)
 
     def _get_months(self):
         """
@@ -436,7 +811,7 @@ class Delta(object):
             @rtype: int
             @return: Number of months
         """
-        return self.td.days % 365 // 30
+        return self._us // _US_PER_DAY % 365 // 30
 
     def _set_months(self, value):
         """
@@ -450,8 +825,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of months
         """
-        value -= self.months
-        self.td = timedelta(seconds=self.total_seconds + (value * 60.0 * 60 * 24 * 30))
+        self._us += _to_microseconds(value - self.months, _US_PER_DAY * 30)
 
     months = property(_get_months, _set_months)
 
@@ -467,7 +841,7 @@ class Delta(object):
             @rtype: float
             @return: Number of months
         """
-        return self.td.days / 30.0 + (self.td.seconds / 30.0 / 24.0 / 60.0 / 60.0) + (self.td.microseconds / 1000000.0 / 30.0 / 24.0 / 60.0 / 60.0)
+        return _divide(self._us, _US_PER_DAY * 30)
 
     def _get_years(self):
         """
@@ -480,7 +854,7 @@ class Delta(object):
             @rtype: int
             @return: Number of years
         """
-        return self.td.days // 365
+        return self._us // _US_PER_DAY // 365
 
     def _set_years(self, value):
         """
@@ -494,8 +868,7 @@ class Delta(object):
             @type value: int or long
             @param value: Number of years
         """
-        value -= self.years
-        self.td = timedelta(seconds=self.total_seconds + (value * 60.0 * 60 * 24 * 365))
+        self._us += _to_microseconds(value - self.years, _US_PER_DAY * 365)
 
     years = property(_get_years, _set_years)
 
@@ -511,7 +884,7 @@ class Delta(object):
             @rtype: float
             @return: Number of years
         """
-        return self.td.days / 365.0 + (self.td.seconds / 365.0 / 24.0 / 60.0 / 60.0) + (self.td.microseconds / 1000000.0 / 365.0 / 24.0 / 60.0 / 60.0)
+        return _divide(self._us, _US_PER_DAY * 365)
 
 
 @total_ordering
@@ -527,6 +900,11 @@ class Date(object):
          * Convenience methods for (start, end) tuples of the current day,
            month, or year.
 
+        Internally a date is held as a datetime, as a single integer count
+        of microseconds (see L{ticks}) or both. Whichever is missing is only
+        computed when needed and then cached, so comparisons and shifting by
+        a L{Delta} are plain integer operations.
+
             >>> d = Date(123456)
             >>> str(d)
             'Date(1970-01-02, 11:17:36)'
@@ -557,6 +935,8 @@ class Date(object):
             False
 
     """
+    __slots__ = ("_dt", "_ticks")
+
     def __init__(self, dt = None, years_ago = 0, months_ago = 0, days_ago = 0,
                  hours_ago = 0, minutes_ago = 0, seconds_ago = 0,
                  format = None, utc = False):
@@ -571,6 +951,8 @@ class Date(object):
                 Date(2009-02-14, 00:00:00)
                 >>> Date("2009-02-14", format = "%Y-%m-%d")
                 Date(2009-02-14, 00:00:00)
+                >>> Date("14 Feb 2009", format = "auto")
+                Date(2009-02-14, 00:00:00)
                 >>> Date(date(2009, 10, 2))
                 Date(2009-10-02, 00:00:00)
                 >>> Date(datetime(2007, 3, 24))
@@ -594,7 +976,9 @@ class Date(object):
             @param seconds_ago: The number of seconds ago from dt to set the
                                 date
             @type format: str
-            @param format: The format to pass to strptime if dt is a string.
+            @param format: The format to pass to strptime if dt is a string,
+                           "iso" for ISO 8601 strings or "auto" to detect
+                           the format, see L{FormatSniffer}.
             @type utc: bool
             @param utc: If dt is None and utc is True, sets the date to
                         datetime.utcnow instead of datetime.now
@@ -603,12 +987,17 @@ class Date(object):
         if dt is None:
             self.dt = datetime.now()
         elif is_number(dt):
-            self.dt = datetime.fromtimestamp(dt)
+            self._dt = None
+            self._ticks = _timestamp_to_ticks(dt)
         elif is_string(dt):
             if format is None:
                 raise ValueError("When passing in a string you must also " \
                                  "pass in a format description!")
-            self.dt = datetime.strptime(dt, format)
+            elif format == "auto":
+                # A single value has no stream of values to lock onto
+                self.dt = FormatSniffer().parse(dt)
+            else:
+                self.dt = compile_format(format).parse(dt)
         elif type(dt) in [list, tuple]:
             self.dt = datetime(*dt)
         elif type(dt) is time.struct_time:
@@ -618,24 +1007,57 @@ class Date(object):
             self.dt = datetime.combine(dt, datetime.min.time())
         elif type(dt) is datetime:
             self.dt = dt
+        elif isinstance(dt, Date):
+            self.dt = dt.dt
         else:
             raise ValueError("You must pass an int, long, float, 9-item " \
                              "list or tuple, date or datetime object! Got " \
                              "%s instead!" % str(dt))
 
         # Add / subtract time as requested
-        self.add(**{
-            "years": -years_ago,
-            "months": -months_ago,
-            "days": -days_ago,
-            "hours": -hours_ago,
-            "minutes": -minutes_ago,
-            "seconds": -seconds_ago
-        })
+        if years_ago or months_ago or days_ago or hours_ago or minutes_ago or \
+           seconds_ago:
+            self.add(-years_ago, -months_ago, -days_ago, -hours_ago,
+                     -minutes_ago, -seconds_ago)
 
         if utc:
             self.dt = self.utc.dt
 
+    @classmethod
+    def from_iso(cls, value):
+        """
+            Create a new Date from an ISO 8601 / RFC 3339 string in extended
+            format, i.e. YYYY-MM-DD optionally followed by T or a space,
+            HH:MM[:SS[.ffffff]] and a Z or +HH:MM style offset. This is much
+            faster than passing a format. Strings with an offset are
+            converted to local time, others are taken as local time.
+
+                >>> Date.from_iso("2009-02-14")
+                Date(2009-02-14, 00:00:00)
+                >>> Date.from_iso("2009-02-14T00:31:30.123").microsecond
+                123000
+                >>> Date.from_iso("2009-02-13T23:31:30Z")
+                Date(2009-02-14, 00:31:30)
+                >>> Date.from_iso("2009-02-14 05:31:30+05:00")
+                Date(2009-02-14, 01:31:30)
+                >>> Date.from_iso("14.02.2009")
+                Traceback (most recent call last):
+                    ...
+                ValueError: Invalid ISO 8601 date/time: '14.02.2009'
+                >>> Date.from_iso("2009-02-14T00:31:30+99:99")
+                Traceback (most recent call last):
+                    ...
+                ValueError: Invalid ISO 8601 date/time: '2009-02-14T00:31:30+99:99'
+
+            @type value: str
+            @param value: The ISO 8601 date or date and time
+            @rtype: Date
+            @return: A new date object
+            @raise ValueError: If value is not a valid ISO 8601 date
+            @raise OverflowError: If value is out of the range of datetime
+        """
+        return cls(_iso_to_datetime(value))
+
     def __repr__(self):
         """
             Return a nice string representation of this date.
@@ -658,10 +1080,16 @@ class Date(object):
             @rtype: Date
             @return: The modified date object
         """
-        if type(value) == Delta:
-            value = value.timedelta
+        if type(value) is Delta:
+            if self._is_aware():
+                return type(self)(self.dt + value.td)
+            return type(self).from_ticks(self.ticks + value._us)
+
+        if type(value) is timedelta and not self._is_aware():
+            return type(self).from_ticks(self.ticks +
+                                         _timedelta_to_ticks(value))
 
-        return Date(self.dt.__add__(value))
+        return type(self)(self.dt + value)
 
     def __sub__(self, value):
         """
@@ -681,14 +1109,29 @@ class Date(object):
             @return: The modified date object or date/time difference
         """
         if type(value) is timedelta:
-            return Date(self.dt.__sub__(value))
+            if self._is_aware():
+                return type(self)(self.dt - value)
+            return type(self).from_ticks(self.ticks -
+                                         _timedelta_to_ticks(value))
         elif type(value) is Delta:
-            return Date(self.dt.__sub__(value.timedelta))
-        elif type(value) is Date:
-            return Delta(self.dt - value.dt)
+            if self._is_aware():
+                return type(self)(self.dt - value.td)
+            return type(self).from_ticks(self.ticks - value._us)
+        elif isinstance(value, Date):
+            if self._is_aware() or value._is_aware():
+                return Delta(self.dt - value.dt)
+            return Delta.from_microseconds(self.ticks - value.ticks)
         else:
             raise TypeError("Expected Date or timedelta!")
 
+    def _is_aware(self):
+        """
+            Get whether this date wraps a datetime with a tzinfo. Ticks are
+            wall-clock time, so such dates use datetime arithmetic instead.
+        """
+        dt = self._dt
+        return dt is not None and dt.tzinfo is not None
+
     def __cmp__(self, value):
         """
             Compare this date object to another date object.
@@ -704,10 +1147,14 @@ class Date(object):
             @return: -1 if it is smaller, 0 if they are equal, 1 if it is
                      greater than the other date object
         """
-        if type(value) == Date:
-            return cmp(self.dt, value.dt)
+        if isinstance(value, Date):
+            if self._is_aware() or value._is_aware():
+                return cmp(self.dt, value.dt)
+            return cmp(self.ticks, value.ticks)
         else:
-            raise TypeError("Invalid type!")
+            # Python 2 falls back to this after __eq__, and other objects
+            # are never equal to a date
+            return NotImplemented
 
     def __lt__(self, value):
         """
@@ -723,14 +1170,27 @@ class Date(object):
             @rtype: bool
             @return: True if it is smaller, False if not smaller
         """
-        if type(value) == Date:
-            return self.dt < value.dt
-        else:
+        # Only dates have ticks; this is faster than checking the type,
+        # which matters as this is called a lot when sorting
+        try:
+            b = value._ticks
+        except AttributeError:
             raise TypeError("Invalid type!")
 
+        if self._is_aware() or value._is_aware():
+            return self.dt < value.dt
+
+        a = self._ticks
+        if a is None:
+            a = self.ticks
+        if b is None:
+            b = value.ticks
+        return a < b
+
     def __eq__(self, value):
         """
             Compare to see if this date object is equal to another date object.
+            Other objects are never equal to a date.
 
                 >>> Date(12345) > Date(1234)
                 True
@@ -738,14 +1198,107 @@ class Date(object):
                 False
                 >>> Date(12345) == Date(12345)
                 True
+                >>> Date(12345) == 12345
+                False
+
+            Dates with a tzinfo are compared like their datetimes:
+
+                >>> from datetime import tzinfo
+                >>> class Offset(tzinfo):
+                ...     def __init__(self, hours):
+                ...         self.offset = timedelta(hours=hours)
+                ...     def utcoffset(self, dt):
+                ...         return self.offset
+                >>> a = Date(datetime(2009, 2, 14, 5, tzinfo=Offset(5)))
+                >>> b = Date(datetime(2009, 2, 14, tzinfo=Offset(0)))
+                >>> a == b, a - b, (a + Delta(60)).dt.tzinfo is a.dt.tzinfo
+                (True, Delta(0 seconds), True)
 
             @rtype: bool
             @return: True if equal, False if not
         """
-        if type(value) == Date:
+        try:
+            b = value._ticks
+        except AttributeError:
+            return NotImplemented
+
+        if self._is_aware() or value._is_aware():
             return self.dt == value.dt
-        else:
-            raise TypeError("Invalid type!")
+
+        a = self._ticks
+        if a is None:
+            a = self.ticks
+        if b is None:
+            b = value.ticks
+        return a == b
+
+    def __reduce__(self):
+        """
+            Pickle this date as its datetime, as slots can't be pickled with
+            the older protocols.
+
+                >>> import pickle
+                >>> [pickle.loads(pickle.dumps(Date(1234567890), x))
+                ...  for x in (0, pickle.HIGHEST_PROTOCOL)]
+                [Date(2009-02-14, 00:31:30), Date(2009-02-14, 00:31:30)]
+        """
+        return (Date, (self.dt,))
+
+    @classmethod
+    def from_ticks(cls, ticks):
+        """
+            Create a new Date from a number of ticks, see L{ticks}. No
+            datetime is created until one is needed.
+
+                >>> Date.from_ticks(1234567890123456)
+                Date(2009-02-13, 23:31:30)
+
+            @type ticks: int
+            @param ticks: Microseconds of wall-clock time since 1970-01-01
+            @rtype: Date
+            @return: A new date object
+            @raise OverflowError: If ticks is out of the range of datetime
+        """
+        if not _MIN_TICKS <= ticks <= _MAX_TICKS:
+            raise OverflowError("date value out of range")
+
+        value = cls.__new__(cls)
+        value._dt = None
+        value._ticks = ticks
+        return value
+
+    def _get_dt(self):
+        dt = self._dt
+        if dt is None:
+            dt = self._dt = _ticks_to_datetime(self._ticks)
+        return dt
+
+    def _set_dt(self, value):
+        self._dt = value
+        self._ticks = None
+
+    dt = property(_get_dt, _set_dt)
+
+    @property
+    def ticks(self):
+        """
+            Get this date as a number of microseconds of wall-clock time
+            since 1970-01-01 00:00:00. Unlike a timestamp this is independent
+            of the local time zone, so it is cheap to compute and can be
+            used to compare and sort dates.
+
+                >>> Date(datetime(1970, 1, 2)).ticks
+                86400000000
+                >>> sorted([Date(86400), Date(0)], key=lambda d: d.ticks)
+                [Date(1970-01-01, 01:00:00), Date(1970-01-02, 01:00:00)]
+
+            @rtype: int
+            @return: Microseconds since 1970-01-01 00:00:00
+        """
+        ticks = self._ticks
+        if ticks is None:
+            ticks = self._ticks = _datetime_to_ticks(self._dt)
+        return ticks
 
     def _get_datetime(self):
         """
@@ -869,23 +1422,23 @@ class Date(object):
 
     def _get_timestamp(self):
         """
-            Get this date represented as a Unix timestamp. If this date is
-            beyond MAX defined above, then MAX_TS is returned to prevent
-            ValueError exceptions when converting to a timestamp.
+            Get this date represented as a Unix timestamp. Timestamps are
+            computed with integer arithmetic and work for the full range of
+            datetime, including dates past 2038.
 
                 >>> Date(1234567890).timestamp
                 1234567890
-
-            Note: You cannot represent all possible dates with a timestamp
-            value, and if you attempt to you may get an exception!
+                >>> Date(datetime(2038, 1, 19, 4, 14, 7)).timestamp
+                2147483647
+                >>> Date(datetime(2038, 1, 19, 4, 14, 8)).timestamp
+                2147483648
+                >>> Date(datetime(9999, 12, 31, 23, 59, 59)).timestamp
+                253402297199
 
             @rtype: int
             @return: The timestamp representation of this date
         """
-        if self > MAX:
-            return MAX.timestamp
-        else:
-            return int(time.mktime(self.dt.timetuple()))
+        return _ticks_to_timestamp(self.ticks)
 
     def _set_timestamp(self, value):
         """
@@ -895,11 +1448,16 @@ class Date(object):
                 >>> d.timestamp = 1234567890
                 >>> d
                 Date(2009-02-14, 00:31:30)
+                >>> d.timestamp = 2 ** 31
+                >>> d
+                Date(2038-01-19, 04:14:08)
 
             @type value: int
             @param value: The timestamp to set
+            @raise OverflowError: If value is out of the range of datetime
         """
-        self.dt = self.dt.fromtimestamp(value)
+        self._dt = None
+        self._ticks = _timestamp_to_ticks(value)
 
     timestamp = property(_get_timestamp, _set_timestamp)
 
@@ -962,7 +1520,11 @@ class Date(object):
             @type value: int
             @param value: The month to set
         """
-        self.dt += relativedelta(months = value - self.dt.month)
+        dt = self.dt
+        year, month = divmod(dt.year * 12 + value - 1, 12)
+        month += 1
+        self.dt = dt.replace(year=year, month=month,
+                             day=min(dt.day, _days_in_month(year, month)))
 
     month = property(_get_month, _set_month)
 
@@ -1146,13 +1708,117 @@ class Date(object):
     def add(self, years=0, months=0, days=0, hours=0, minutes=0, seconds=0):
         """
             Add a number of years, months, days, hours, minutes, or seconds
-            and return the modified Date.
+            and return the modified Date. Years and months are added first,
+            and if the day does not exist in the resulting month then the
+            last day of that month is used, like with relativedelta.
+
+                >>> Date(datetime(2008, 2, 29)).add(years=1, hours=-1)
+                Date(2009-02-27, 23:00:00)
+                >>> Date(datetime(2009, 1, 31)).add(months=13, days=1)
+                Date(2010-03-01, 00:00:00)
+
+            @type years: int
+            @param years: The number of years to add
+            @type months: int
+            @param months: The number of months to add
+            @type days: int or float
+            @param days: The number of days to add
+            @type hours: int or float
+            @param hours: The number of hours to add
+            @type minutes: int or float
+            @param minutes: The number of minutes to add
+            @type seconds: int or float
+            @param seconds: The number of seconds to add
+            @rtype: Date
+            @return: This date
         """
-        for unit in ["years", "months", "days", "hours", "minutes", "seconds"]:
-            setattr(self, unit[:-1], getattr(self, unit[:-1]) + locals()[unit])
+        if years or months:
+            dt = self.dt
+            year, month = divmod((dt.year + years) * 12 + dt.month - 1 + months,
+                                 12)
+            month += 1
+            dt = dt.replace(year=year, month=month,
+                            day=min(dt.day, _days_in_month(year, month)))
+
+            if days or hours or minutes or seconds:
+                dt += timedelta(days=days, hours=hours, minutes=minutes,
+                                seconds=seconds)
+
+            self.dt = dt
+        elif days or hours or minutes or seconds:
+            self.dt = self.dt + timedelta(days=days, hours=hours,
+                                          minutes=minutes, seconds=seconds)
 
         return self
 
+    def replace(self, year = None, month = None, day = None, hour = None,
+                minute = None, second = None, microsecond = None):
+        """
+            Get a new date with some fields replaced. This is the same as
+            copying the date and setting each field on the copy in turn,
+            including rolling over values that are out of range, but only
+            computes the result once. If the day is not replaced and does
+            not exist in the new month, the last day of the month is used.
+
+                >>> d = Date(1234567890)
+                >>> d.replace(month=14, day=0, hour=25)
+                Date(2010-02-01, 01:31:30)
+                >>> Date(datetime(2009, 1, 31)).replace(month=2)
+                Date(2009-02-28, 00:00:00)
+                >>> d.replace(year=10001)
+                Traceback (most recent call last):
+                    ...
+                ValueError: year 10001 is out of range
+
+            @type year: int
+            @param year: The year to set
+            @type month: int
+            @param month: The month to set
+            @type day: int
+            @param day: The day to set
+            @type hour: int
+            @param hour: The hour to set
+            @type minute: int
+            @param minute: The minute to set
+            @type second: int
+            @param second: The second to set
+            @type microsecond: int
+            @param microsecond: The microsecond to set
+            @rtype: Date
+            @return: A new date object
+            @raise ValueError: If the year is out of the range of datetime
+            @raise OverflowError: If the result is out of the range of
+                                  datetime
+        """
+        dt = self.dt
+        return type(self).from_ticks(_fields_to_ticks(
+            dt.year if year is None else year,
+            dt.month if month is None else month,
+            dt.day if day is None else day,
+            dt.hour if hour is None else hour,
+            dt.minute if minute is None else minute,
+            dt.second if second is None else second,
+            dt.microsecond if microsecond is None else microsecond,
+            day is None))
+
+    def edit(self):
+        """
+            Get a L{DateEditor} to change several fields of this date at
+            once. The date is only updated once, when the with block ends.
+
+                >>> d = Date(1234567890)
+                >>> with d.edit() as e:
+                ...     e.year = 2010
+                ...     e.month += 11
+                ...     e.hour = 12
+                >>> d
+                Date(2011-01-14, 12:31:30)
+
+            @rtype: DateEditor
+            @return: An editor for this date
+        """
+        return DateEditor(self)
+
     @property
     def utc(self):
         """
@@ -1165,7 +1831,7 @@ class Date(object):
             @rtype: Date
             @return: A new UTC Date object
         """
-        return Date(time.gmtime(self.timestamp))
+        return Date.from_ticks(self.timestamp * _US_PER_SECOND)
 
     @property
     def days_in_month(self):
@@ -1180,7 +1846,8 @@ class Date(object):
             @rtype: int
             @return: The number of days in the month
         """
-        return calendar.monthrange(self.year, self.month)[1]
+        dt = self.dt
+        return _DAYS_IN_MONTH[_LEAP_YEARS[dt.year]][dt.month]
 
     def strftime(self, format = "%d %b %Y"):
         """
@@ -1194,7 +1861,7 @@ class Date(object):
             @rtype: str
             @return: The string representation of this date from format
         """
-        return time.strftime(format, self.tuple)
+        return compile_strftime(format).format(self.dt)
 
     @property
     def start_of_day(self):
@@ -1208,8 +1875,8 @@ class Date(object):
             @rtype: Date
             @return: A new date with min time
         """
-        tuple = self.dt.timetuple()
-        return Date(datetime(tuple[0], tuple[1], tuple[2]))
+        ticks = self.ticks
+        return Date.from_ticks(ticks - ticks % _US_PER_DAY)
 
     @property
     def end_of_day(self):
@@ -1237,9 +1904,8 @@ class Date(object):
             @rtype: Date
             @return: A new date set to the beginning of this week
         """
-        d = self.start_of_day
-        d.day -= d.dt.weekday()
-        return d
+        days = self.ticks // _US_PER_DAY
+        return Date.from_ticks((days - (days + 3) % 7) * _US_PER_DAY)
 
     @property
     def end_of_week(self):
@@ -1267,7 +1933,9 @@ class Date(object):
             @rtype: Date
             @return: A new date set to the beginning of this month
         """
-        return Date(datetime(self.dt.year, self.dt.month, 1))
+        dt = self.dt
+        return Date.from_ticks((dt.toordinal() - _EPOCH_ORDINAL - dt.day + 1) *
+                               _US_PER_DAY)
 
     @property
     def end_of_month(self):
@@ -1280,8 +1948,10 @@ class Date(object):
             @rtype: Date
             @return: A new date set to the end of this month
         """
-        return Date(datetime(self.dt.year, self.dt.month, 1, 23, 59, 59,
-                    999999) + relativedelta(months = 1, days = -1))
+        dt = self.dt
+        return Date(datetime(dt.year, dt.month,
+                             _days_in_month(dt.year, dt.month), 23, 59, 59,
+                             999999))
 
     @property
     def start_of_year(self):
@@ -1294,7 +1964,8 @@ class Date(object):
             @rtype: Date
             @return: A new date set to the beginning of this year
         """
-        return Date(datetime(self.dt.year, 1, 1))
+        return Date.from_ticks(_civil_to_days(self.dt.year, 1, 1) *
+                               _US_PER_DAY)
 
     @property
     def end_of_year(self):
@@ -1307,8 +1978,7 @@ class Date(object):
             @rtype: Date
             @return: A new date set to the end of this year
         """
-        return Date(datetime(self.dt.year, 1, 1, 23, 59, 59, 999999) + \
-                             relativedelta(years = 1, days = -1))
+        return Date(datetime(self.dt.year, 12, 31, 23, 59, 59, 999999))
 
     @property
     def day_tuple(self):
@@ -1370,6 +2040,123 @@ class Date(object):
         """
         return (self.start_of_year, self.end_of_year)
 
+    def bucket(self, period = "day"):
+        """
+            Get the integer id of the day, week, month, quarter or year
+            containing this date. Ids of consecutive periods are consecutive
+            integers, see L{from_bucket} to get the start of a period back.
+
+                >>> d = Date(1234567890)
+                >>> d.bucket("day"), d.bucket("week"), d.bucket("month")
+                (14289, 2041, 24109)
+                >>> d.bucket("quarter"), d.bucket("year")
+                (8036, 2009)
+
+            @type period: str
+            @param period: One of day, week, month, quarter or year
+            @rtype: int
+            @return: The id of the period
+            @raise ValueError: If the period is invalid
+        """
+        return _days_to_period(self.ticks // _US_PER_DAY, period)
+
+    @classmethod
+    def from_bucket(cls, value, period = "day"):
+        """
+            Get the start of a period from its id, see L{bucket}.
+
+                >>> Date.from_bucket(2041, "week")
+                Date(2009-02-09, 00:00:00)
+                >>> Date.from_bucket(8036 + 1, "quarter")
+                Date(2009-04-01, 00:00:00)
+
+            @type value: int
+            @param value: The id of the period
+            @type period: str
+            @param period: One of day, week, month, quarter or year
+            @rtype: Date
+            @return: A new date at the beginning of the period
+            @raise ValueError: If the period is invalid
+            @raise OverflowError: If the period is out of range
+        """
+        return cls.from_ticks(_period_to_days(value, period) * _US_PER_DAY)
+
+    def floor(self, interval, origin = None):
+        """
+            Get the start of the fixed interval containing this date, where
+            intervals are counted from origin. By default origin is
+            1970-01-01 00:00:00 in wall-clock time, so e.g. hours and days
+            start on the hour and at midnight.
+
+                >>> d = Date(1234567890)
+                >>> d.floor(Delta(minutes=15))
+                Date(2009-02-14, 00:30:00)
+                >>> d.floor(Delta(days=7))          # Weeks from a Thursday
+                Date(2009-02-12, 00:00:00)
+                >>> d.floor(Delta(minutes=10), origin=datetime(2009, 1, 1, 0, 5))
+                Date(2009-02-14, 00:25:00)
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: Date
+            @return: A new date at the start of the interval
+            @raise ValueError: If the interval is not positive
+        """
+        step, origin = _get_interval(interval, origin)
+        ticks = self.ticks
+        return type(self).from_ticks(ticks - (ticks - origin) % step)
+
+    def ceil(self, interval, origin = None):
+        """
+            Get the end of the fixed interval containing this date, i.e. the
+            first interval boundary at or after it, see L{floor}.
+
+                >>> Date(1234567890).ceil(Delta(minutes=15))
+                Date(2009-02-14, 00:45:00)
+                >>> Date(datetime(2009, 2, 14, 0, 45)).ceil(900)
+                Date(2009-02-14, 00:45:00)
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: Date
+            @return: A new date at the end of the interval
+            @raise ValueError: If the interval is not positive
+            @raise OverflowError: If the result is out of range
+        """
+        step, origin = _get_interval(interval, origin)
+        ticks = self.ticks
+        return type(self).from_ticks(ticks + (origin - ticks) % step)
+
+    def round(self, interval, origin = None):
+        """
+            Get the nearest interval boundary to this date, see L{floor}.
+            Dates halfway between two boundaries are rounded up.
+
+                >>> Date(1234567890).round(Delta(minutes=15))
+                Date(2009-02-14, 00:30:00)
+                >>> Date(1234567890).round(Delta(minutes=1))
+                Date(2009-02-14, 00:32:00)
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: Date
+            @return: A new date at the nearest boundary
+            @raise ValueError: If the interval is not positive
+            @raise OverflowError: If the result is out of range
+        """
+        step, origin = _get_interval(interval, origin)
+        ticks = self.ticks
+        offset = (ticks - origin) % step
+        if offset * 2 >= step:
+            offset -= step
+        return type(self).from_ticks(ticks - offset)
+
     @property
     def friendly(self):
         """
@@ -1463,7 +2250,7 @@ class Date(object):
             @rtype: str
             @return: SQL-friendly representation of this date/time
         """
-        return self.sql_date[:-1] + " " + self.sql_time[1:]
+        return self.strftime("'%Y-%m-%d %H:%M:%S'")
 
     @property
     def is_today(self):
@@ -1510,6 +2297,3618 @@ class Date(object):
         """
         return self.dt.date() < datetime.today().date()
 
+
+_INTERN_TABLE_SIZE = 65536
+_interned = {}
+
+class FrozenDate(Date):
+    """
+        An immutable L{Date}. Frozen dates can not be modified, which makes
+        them hashable so they can be used as dict keys and in sets. The hash
+        is computed once from the date's tick value. Frozen dates are equal
+        to mutable dates with the same value.
+
+        Common values such as the start of a day or month are interned, so
+        e.g. grouping by day shares a single object per day.
+
+            >>> d = FrozenDate(1234567890)
+            >>> d
+            Date(2009-02-14, 00:31:30)
+            >>> d == Date(1234567890)
+            True
+            >>> len(set([d, FrozenDate(1234567890), FrozenDate(0)]))
+            2
+            >>> {d.start_of_day: 1}[FrozenDate(datetime(2009, 2, 14))]
+            1
+            >>> d.start_of_day is FrozenDate(1234600000).start_of_day
+            True
+            >>> d + Delta(hours = 1)
+            Date(2009-02-14, 01:31:30)
+            >>> d.day += 1
+            Traceback (most recent call last):
+                ...
+            AttributeError: FrozenDate objects are immutable!
+
+        Takes the same parameters as L{Date}, or an existing L{Date}.
+    """
+    __slots__ = ()
+
+    def __init__(self, dt = None, *args, **kwargs):
+        if args or kwargs or not isinstance(dt, (Date, datetime)):
+            dt = Date(dt, *args, **kwargs)
+
+        if isinstance(dt, Date):
+            dt = dt.dt
+
+        # Both representations are filled in up front, as they can't be
+        # cached later on
+        object.__setattr__(self, "_dt", dt)
+        object.__setattr__(self, "_ticks", _datetime_to_ticks(dt))
+
+    @classmethod
+    def from_ticks(cls, ticks):
+        """
+            Create a new FrozenDate from a number of ticks, see L{Date.ticks}.
+
+            @type ticks: int
+            @param ticks: Microseconds of wall-clock time since 1970-01-01
+            @rtype: FrozenDate
+            @return: A new frozen date object
+            @raise OverflowError: If ticks is out of the range of datetime
+        """
+        if not _MIN_TICKS <= ticks <= _MAX_TICKS:
+            raise OverflowError("date value out of range")
+
+        return cls(_ticks_to_datetime(ticks))
+
+    @classmethod
+    def intern(cls, value):
+        """
+            Get the canonical frozen date for a value, so that equal dates
+            share a single object.
+
+                >>> FrozenDate.intern(Date(0)) is FrozenDate.intern(Date(0))
+                True
+
+            @type value: Date or datetime
+            @param value: The date to intern
+            @rtype: FrozenDate
+            @return: The shared frozen date for value
+        """
+        if not isinstance(value, FrozenDate):
+            value = cls(value)
+
+        try:
+            return _interned[value]
+        except KeyError:
+            if len(_interned) >= _INTERN_TABLE_SIZE:
+                _interned.clear()
+            _interned[value] = value
+            return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenDate objects are immutable!")
+
+    def __delattr__(self, name):
+        raise AttributeError("FrozenDate objects are immutable!")
+
+    def __hash__(self):
+        if self._dt.tzinfo is not None:
+            return hash(self._dt)
+        return hash(self._ticks)
+
+    def __reduce__(self):
+        return (FrozenDate, (self.dt,))
+
+    @property
+    def start_of_day(self):
+        """
+            Get the interned start date/time of this day.
+
+            @rtype: FrozenDate
+            @return: The shared frozen date at the beginning of this day
+        """
+        return FrozenDate.intern(Date.start_of_day.fget(self))
+
+    @property
+    def start_of_week(self):
+        """
+            Get the interned start date/time of this week.
+
+            @rtype: FrozenDate
+            @return: The shared frozen date at the beginning of this week
+        """
+        return FrozenDate.intern(Date.start_of_week.fget(self))
+
+    @property
+    def start_of_month(self):
+        """
+            Get the interned start date/time of this month.
+
+            @rtype: FrozenDate
+            @return: The shared frozen date at the beginning of this month
+        """
+        return FrozenDate.intern(Date.start_of_month.fget(self))
+
+    @property
+    def start_of_year(self):
+        """
+            Get the interned start date/time of this year.
+
+            @rtype: FrozenDate
+            @return: The shared frozen date at the beginning of this year
+        """
+        return FrozenDate.intern(Date.start_of_year.fget(self))
+
+
+class DateEditor(object):
+    """
+        Collects changes to the fields of a L{Date} and applies them all at
+        once, either when used as a context manager and the with block ends
+        without an exception, or when L{commit} is called. Setting fields
+        has the same effect as setting them on the date one after another,
+        see L{Date.replace}. Get an editor from L{Date.edit}.
+
+            >>> d = Date(datetime(2009, 1, 31, 10))
+            >>> e = d.edit()
+            >>> e.month = 2
+            >>> e.minute -= 30
+            >>> e.month, e.day, e.minute
+            (2, 31, -30)
+            >>> e.commit()
+            >>> d
+            Date(2009-02-28, 09:30:00)
+            >>> e.day = 31
+            >>> e.commit()
+            >>> d
+            Date(2009-03-03, 09:30:00)
+
+        @type value: Date
+        @param value: The date to edit
+    """
+    __slots__ = ("date", "year", "month", "_day", "_day_set", "hour", "minute",
+                 "second", "microsecond")
+
+    def __init__(self, value):
+        dt = value.dt
+        self.date = value
+        self.year = dt.year
+        self.month = dt.month
+        self._day = dt.day
+        self._day_set = False
+        self.hour = dt.hour
+        self.minute = dt.minute
+        self.second = dt.second
+        self.microsecond = dt.microsecond
+
+    def _get_day(self):
+        return self._day
+
+    def _set_day(self, value):
+        self._day = value
+        self._day_set = True
+
+    day = property(_get_day, _set_day)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def commit(self):
+        """
+            Apply the changes to the date being edited.
+
+            @raise OverflowError: If the result is out of the range of
+                                  datetime
+        """
+        ticks = _fields_to_ticks(self.year, self.month, self.day, self.hour,
+                                 self.minute, self.second, self.microsecond,
+                                 not self._day_set)
+
+        if not _MIN_TICKS <= ticks <= _MAX_TICKS:
+            raise OverflowError("date value out of range")
+
+        self.date._dt = None
+        self.date._ticks = ticks
+
+        # Further changes continue from the new date
+        self.__init__(self.date)
+
+
+class DateArray(object):
+    """
+        A compact, columnar sequence of dates. Instead of one L{Date} object
+        wrapping one datetime per value, all values are stored in a single
+        C{array} of 64-bit integer ticks (microseconds of wall-clock time
+        since 1970-01-01 00:00:00). The usual L{Date} attributes are available
+        as vectorized operations which return arrays rather than objects.
+
+            >>> a = DateArray([Date(1234567890), Date(datetime(1981, 2, 13))])
+            >>> len(a)
+            2
+            >>> a
+            DateArray([Date(2009-02-14, 00:31:30), Date(1981-02-13, 00:00:00)])
+            >>> a.year.tolist()
+            [2009, 1981]
+            >>> a.week.tolist()
+            [6, 6]
+            >>> a.timestamp.tolist()
+            [1234567890, 350866800]
+            >>> a[1]
+            Date(1981-02-13, 00:00:00)
+            >>> a.start_of_day
+            DateArray([Date(2009-02-14, 00:00:00), Date(1981-02-13, 00:00:00)])
+            >>> a > Date(datetime(2000, 1, 1))
+            [True, False]
+            >>> a.strftime("%Y-%m-%d")
+            ['2009-02-14', '1981-02-13']
+
+        @type dates: iterable or None
+        @param dates: Values to store; each may be a L{Date}, a datetime or
+                      anything else the L{Date} constructor accepts
+    """
+    def __init__(self, dates = None):
+        self.ticks = array(_TICK_TYPECODE)
+
+        if dates is not None:
+            self.extend(dates)
+
+    @classmethod
+    def from_ticks(cls, ticks):
+        """
+            Create a new array directly from a sequence of ticks. If ticks is
+            already an array of the right type it is used as-is and not
+            copied.
+
+                >>> DateArray.from_ticks([0, 86400000000])
+                DateArray([Date(1970-01-01, 00:00:00), Date(1970-01-02, 00:00:00)])
+
+            @type ticks: array or iterable of int
+            @param ticks: Microseconds of wall-clock time since 1970-01-01
+            @rtype: DateArray
+            @return: A new array of dates
+        """
+        value = cls()
+
+        if isinstance(ticks, array) and ticks.typecode == _TICK_TYPECODE:
+            value.ticks = ticks
+        else:
+            value.ticks.extend(ticks)
+
+        return value
+
+    @classmethod
+    def from_timestamps(cls, timestamps):
+        """
+            Create a new array from a number of Unix timestamps, converted
+            to local time like L{Date}(timestamp) does.
+
+                >>> DateArray.from_timestamps([1234567890, 0.5, 2 ** 31])
+                DateArray([Date(2009-02-14, 00:31:30), Date(1970-01-01, 01:00:00), Date(2038-01-19, 04:14:08)])
+
+            @type timestamps: iterable
+            @param timestamps: Unix timestamps as ints or floats
+            @rtype: DateArray
+            @return: A new array of dates
+        """
+        return cls.from_ticks(array(_TICK_TYPECODE,
+                                    [_timestamp_to_ticks(x) for x in timestamps]))
+
+    @classmethod
+    def range(cls, start, end, step = None):
+        """
+            Create a new array with the dates of L{date_range}(start, end,
+            step).
+
+                >>> DateArray.range(Date(0), Date(86400 * 3), Delta(days=1))
+                DateArray([Date(1970-01-01, 01:00:00), Date(1970-01-02, 01:00:00), Date(1970-01-03, 01:00:00)])
+
+            @type start: Date or anything L{Date} accepts
+            @param start: The first date
+            @type end: Date or anything L{Date} accepts
+            @param end: The date to stop before
+            @type step: Delta, timedelta, relativedelta or number
+            @param step: The step between dates, one day by default
+            @rtype: DateArray
+            @return: A new array of dates
+        """
+        return DateRange(start, end, step).to_array()
+
+    @classmethod
+    def from_buckets(cls, values, period = "day"):
+        """
+            Create a new DateArray with the start of each period from the
+            period ids returned by L{bucket}.
+
+                >>> DateArray.from_buckets([24109, 24110], "month")
+                DateArray([Date(2009-02-01, 00:00:00), Date(2009-03-01, 00:00:00)])
+
+            @type values: iterable
+            @param values: The ids of the periods
+            @type period: str
+            @param period: One of day, week, month, quarter or year
+            @rtype: DateArray
+            @return: The start of each period
+            @raise ValueError: If the period is invalid
+            @raise OverflowError: If a period is out of range
+        """
+        if period not in _PERIODS:
+            raise ValueError("Invalid period %r!" % period)
+
+        cache = {}
+        ticks = array(_TICK_TYPECODE)
+        append = ticks.append
+
+        for value in values:
+            try:
+                append(cache[value])
+            except KeyError:
+                cache[value] = start = _period_to_days(value, period) * \
+                                       _US_PER_DAY
+                if not _MIN_TICKS <= start <= _MAX_TICKS:
+                    raise OverflowError("date value out of range")
+                append(start)
+
+        return cls.from_ticks(ticks)
+
+    @classmethod
+    def from_strings(cls, values, format):
+        """
+            Create a new array by parsing a number of strings with a format,
+            see L{compile_format}.
+
+                >>> DateArray.from_strings(["14.02.2009", "01.01.2010"], "%d.%m.%Y")
+                DateArray([Date(2009-02-14, 00:00:00), Date(2010-01-01, 00:00:00)])
+                >>> DateArray.from_strings(["01/02/2009", "02/28/2009"], "auto")
+                DateArray([Date(2009-01-02, 00:00:00), Date(2009-02-28, 00:00:00)])
+
+            @type values: iterable
+            @param values: The strings to parse
+            @type format: str
+            @param format: The format description, see datetime.strptime(...),
+                           or "auto" to detect it, see L{FormatSniffer}
+            @rtype: DateArray
+            @return: A new array of dates
+            @raise ValueError: If any value does not match the format
+        """
+        return compile_format(format).parse_many(values)
+
+    @classmethod
+    def from_iso(cls, values):
+        """
+            Create a new array by parsing a number of ISO 8601 / RFC 3339
+            strings, see L{Date.from_iso}.
+
+                >>> DateArray.from_iso(["2009-02-14T00:31:30", "2009-02-13T23:31:30Z"])
+                DateArray([Date(2009-02-14, 00:31:30), Date(2009-02-14, 00:31:30)])
+                >>> DateArray.from_iso(["9999-12-31T23:59:59-05:00"])
+                Traceback (most recent call last):
+                    ...
+                OverflowError: date value out of range
+
+            @type values: iterable
+            @param values: The ISO 8601 strings to parse
+            @rtype: DateArray
+            @return: A new array of dates
+            @raise ValueError: If any value is not a valid ISO 8601 date
+            @raise OverflowError: If any value is out of the range of
+                                  datetime
+        """
+        return cls.from_ticks(array(_TICK_TYPECODE,
+                                    [_iso_to_ticks(x) for x in values]))
+
+    def __repr__(self):
+        """
+            Return a nice string representation of this array. Long arrays
+            are abbreviated.
+
+                >>> DateArray()
+                DateArray([])
+                >>> DateArray([0] * 10)     # doctest: +ELLIPSIS
+                DateArray([Date(1970-01-01, 01:00:00), ..., Date(1970-01-01, 01:00:00)])
+
+        """
+        if len(self) > 6:
+            items = [repr(self[x]) for x in (0, 1, 2)] + ["..."] + \
+                    [repr(self[x]) for x in (-3, -2, -1)]
+        else:
+            items = [repr(x) for x in self]
+
+        return "DateArray([%s])" % ", ".join(items)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __iter__(self):
+        for ticks in self.ticks:
+            yield Date.from_ticks(ticks)
+
+    def __getitem__(self, index):
+        """
+            Get a single L{Date} or, when passed a slice, a new L{DateArray}.
+
+                >>> a = DateArray([0, 86400, 172800])
+                >>> a[-1]
+                Date(1970-01-03, 01:00:00)
+                >>> a[:2]
+                DateArray([Date(1970-01-01, 01:00:00), Date(1970-01-02, 01:00:00)])
+
+            @rtype: Date or DateArray
+            @return: The date at index or the dates in the slice
+        """
+        if isinstance(index, slice):
+            return DateArray.from_ticks(self.ticks[index])
+
+        return Date.from_ticks(self.ticks[index])
+
+    def append(self, value):
+        """
+            Append a single date to the end of this array.
+
+            @type value: Date, datetime or anything Date accepts
+            @param value: The date to append
+        """
+        self.ticks.append(_to_ticks(value))
+
+    def extend(self, values):
+        """
+            Append a number of dates to the end of this array.
+
+            @type values: iterable
+            @param values: Dates, datetimes or anything Date accepts
+        """
+        if isinstance(values, DateArray):
+            self.ticks.extend(values.ticks)
+        else:
+            self.ticks.extend([_to_ticks(x) for x in values])
+
+    def _compare(self, value, op):
+        if isinstance(value, DateArray):
+            if len(value) != len(self):
+                raise ValueError("Cannot compare arrays of different lengths!")
+            return [op(a, b) for a, b in zip(self.ticks, value.ticks)]
+        elif isinstance(value, (Date, datetime)):
+            other = _to_ticks(value)
+            return [op(a, other) for a in self.ticks]
+        else:
+            # Let Python fall back to identity, so e.g. a == None is False
+            return NotImplemented
+
+    def __lt__(self, value):
+        return self._compare(value, lambda a, b: a < b)
+
+    def __le__(self, value):
+        return self._compare(value, lambda a, b: a <= b)
+
+    def __gt__(self, value):
+        return self._compare(value, lambda a, b: a > b)
+
+    def __ge__(self, value):
+        return self._compare(value, lambda a, b: a >= b)
+
+    def __eq__(self, value):
+        """
+            Compare element-wise to a L{Date} or another L{DateArray} of the
+            same length, returning a list of booleans.
+
+                >>> a = DateArray([0, 86400])
+                >>> a == Date(86400)
+                [False, True]
+                >>> a == DateArray([0, 0])
+                [True, False]
+                >>> a == None, a in [None]
+                (False, False)
+
+            @rtype: list
+            @return: A list of booleans, one per element
+        """
+        return self._compare(value, lambda a, b: a == b)
+
+    def __ne__(self, value):
+        return self._compare(value, lambda a, b: a != b)
+
+    # Element-wise comparisons make arrays unhashable, just like lists
+    __hash__ = None
+
+    def __add__(self, value):
+        """
+            Add a L{Delta} or timedelta to each date, or a L{DeltaArray} of
+            the same length element-wise.
+
+                >>> DateArray([0, 60]) + Delta(30)
+                DateArray([Date(1970-01-01, 01:00:30), Date(1970-01-01, 01:01:30)])
+
+            @rtype: DateArray
+            @return: The new dates
+        """
+        if isinstance(value, DeltaArray):
+            if len(value) != len(self):
+                raise ValueError("Cannot add arrays of different lengths!")
+            ticks = [a + b for a, b in zip(self.ticks, value.ticks)]
+        elif isinstance(value, (Delta, timedelta)):
+            offset = _to_delta_ticks(value)
+            ticks = [t + offset for t in self.ticks]
+        else:
+            return NotImplemented
+
+        if ticks and not (_MIN_TICKS <= min(ticks) and
+                          max(ticks) <= _MAX_TICKS):
+            raise OverflowError("date value out of range")
+
+        return DateArray.from_ticks(array(_TICK_TYPECODE, ticks))
+
+    def __sub__(self, value):
+        """
+            Subtract a L{Date} from each date, or a L{DateArray} of the same
+            length element-wise, giving a L{DeltaArray}. Subtracting a
+            L{Delta}, timedelta or L{DeltaArray} gives a new L{DateArray}.
+
+                >>> a = DateArray([60, 3600])
+                >>> a - Date(0)
+                DeltaArray([Delta(1 minute), Delta(1 hour)])
+                >>> a - DateArray([0, 0])
+                DeltaArray([Delta(1 minute), Delta(1 hour)])
+                >>> a - Delta(60)
+                DateArray([Date(1970-01-01, 01:00:00), Date(1970-01-01, 01:59:00)])
+
+            @rtype: DeltaArray or DateArray
+            @return: The differences or the new dates
+        """
+        if isinstance(value, DateArray):
+            if len(value) != len(self):
+                raise ValueError("Cannot subtract arrays of different "
+                                 "lengths!")
+            return DeltaArray.from_ticks(array(_TICK_TYPECODE,
+                [a - b for a, b in zip(self.ticks, value.ticks)]))
+        elif isinstance(value, (Date, datetime)):
+            other = _to_ticks(value)
+            return DeltaArray.from_ticks(array(_TICK_TYPECODE,
+                                               [t - other for t in self.ticks]))
+        elif isinstance(value, (Delta, timedelta)):
+            return self + Delta.from_microseconds(-_to_delta_ticks(value))
+        elif isinstance(value, DeltaArray):
+            return self + DeltaArray.from_ticks([-x for x in value.ticks])
+        else:
+            return NotImplemented
+
+    def _map_days(self, func):
+        # Dates tend to cluster, so decode each distinct day only once
+        cache = {}
+        result = array(_TICK_TYPECODE)
+        append = result.append
+
+        for t in self.ticks:
+            days = t // _US_PER_DAY
+            try:
+                append(cache[days])
+            except KeyError:
+                cache[days] = value = func(days)
+                append(value)
+
+        return result
+
+    @property
+    def year(self):
+        """
+            Get the year of each date.
+
+            @rtype: array
+            @return: The years
+        """
+        return self._map_days(lambda days: _days_to_date(days).year)
+
+    @property
+    def month(self):
+        """
+            Get the month of each date.
+
+                >>> DateArray([1234567890]).month.tolist()
+                [2]
+
+            @rtype: array
+            @return: The months [1, 12]
+        """
+        return self._map_days(lambda days: _days_to_date(days).month)
+
+    @property
+    def week(self):
+        """
+            Get the week of the year of each date, counted the same way as
+            L{Date.week}.
+
+                >>> DateArray([1234567890]).week.tolist()
+                [6]
+
+            @rtype: array
+            @return: The weeks [0, 52]
+        """
+        def week(days):
+            return (days - _date_to_days(date(_days_to_date(days).year, 1,
+                                              1))) // 7
+        return self._map_days(week)
+
+    @property
+    def day(self):
+        """
+            Get the day of the month of each date.
+
+                >>> DateArray([1234567890]).day.tolist()
+                [14]
+
+            @rtype: array
+            @return: The days
+        """
+        return self._map_days(lambda days: _days_to_date(days).day)
+
+    @property
+    def hour(self):
+        """
+            Get the hour of each date.
+
+                >>> DateArray([1234567890]).hour.tolist()
+                [0]
+
+            @rtype: array
+            @return: The hours
+        """
+        return array(_TICK_TYPECODE, [t % _US_PER_DAY // _US_PER_HOUR
+                                      for t in self.ticks])
+
+    @property
+    def minute(self):
+        """
+            Get the minute of each date.
+
+                >>> DateArray([1234567890]).minute.tolist()
+                [31]
+
+            @rtype: array
+            @return: The minutes
+        """
+        return array(_TICK_TYPECODE, [t % _US_PER_HOUR // _US_PER_MINUTE
+                                      for t in self.ticks])
+
+    @property
+    def second(self):
+        """
+            Get the second of each date.
+
+                >>> DateArray([1234567890]).second.tolist()
+                [30]
+
+            @rtype: array
+            @return: The seconds
+        """
+        return array(_TICK_TYPECODE, [t % _US_PER_MINUTE // _US_PER_SECOND
+                                      for t in self.ticks])
+
+    @property
+    def microsecond(self):
+        """
+            Get the microsecond of each date.
+
+                >>> DateArray([1234567890.5]).microsecond.tolist()
+                [500000]
+
+            @rtype: array
+            @return: The microseconds
+        """
+        return array(_TICK_TYPECODE, [t % _US_PER_SECOND for t in self.ticks])
+
+    @property
+    def timestamp(self):
+        """
+            Get each date as a Unix timestamp, see L{Date.timestamp}.
+
+                >>> DateArray([1234567890, 0, 2 ** 31, 2 ** 34]).timestamp.tolist()
+                [1234567890, 0, 2147483648, 17179869184]
+
+            @rtype: array
+            @return: The timestamps
+        """
+        to_utc = _local_zone.to_utc
+        return array(_TICK_TYPECODE, [to_utc(t // _US_PER_SECOND)
+                                      for t in self.ticks])
+
+    def _map_ticks(self, func):
+        return DateArray.from_ticks(array(_TICK_TYPECODE,
+                                          [func(t) for t in self.ticks]))
+
+    @property
+    def start_of_day(self):
+        """
+            Get a new array with the time part of each date set to zero.
+
+            @rtype: DateArray
+            @return: New dates with min time
+        """
+        return self._map_ticks(lambda t: t - t % _US_PER_DAY)
+
+    @property
+    def end_of_day(self):
+        """
+            Get a new array with the time part of each date set to the max.
+
+                >>> DateArray([1234567890]).end_of_day
+                DateArray([Date(2009-02-14, 23:59:59)])
+
+            @rtype: DateArray
+            @return: New dates with max time
+        """
+        return self._map_ticks(lambda t: t - t % _US_PER_DAY + _US_PER_DAY - 1)
+
+    @property
+    def start_of_week(self):
+        """
+            Get the start date/time of the week of each date.
+
+                >>> DateArray([1234567890]).start_of_week
+                DateArray([Date(2009-02-09, 00:00:00)])
+
+            @rtype: DateArray
+            @return: New dates set to the beginning of their week
+        """
+        # 1970-01-01 was a Thursday, i.e. weekday 3
+        return self._map_ticks(lambda t: (t // _US_PER_DAY -
+                               (t // _US_PER_DAY + 3) % 7) * _US_PER_DAY)
+
+    @property
+    def end_of_week(self):
+        """
+            Get the end date/time of the week of each date.
+
+                >>> DateArray([1234567890]).end_of_week
+                DateArray([Date(2009-02-15, 23:59:59)])
+
+            @rtype: DateArray
+            @return: New dates set to the end of their week
+        """
+        return self._map_ticks(lambda t: (t // _US_PER_DAY + 7 -
+                               (t // _US_PER_DAY + 3) % 7) * _US_PER_DAY - 1)
+
+    @property
+    def start_of_month(self):
+        """
+            Get the start date/time of the month of each date.
+
+                >>> DateArray([1234567890]).start_of_month
+                DateArray([Date(2009-02-01, 00:00:00)])
+
+            @rtype: DateArray
+            @return: New dates set to the beginning of their month
+        """
+        return DateArray.from_buckets(self.bucket("month"), "month")
+
+    @property
+    def end_of_month(self):
+        """
+            Get the end date/time of the month of each date.
+
+                >>> DateArray([1234567890]).end_of_month
+                DateArray([Date(2009-02-28, 23:59:59)])
+
+            @rtype: DateArray
+            @return: New dates set to the end of their month
+        """
+        def end(t):
+            value = _days_to_date(t // _US_PER_DAY)
+            days = _date_to_days(value) - value.day + \
+                   _days_in_month(value.year, value.month)
+            return (days + 1) * _US_PER_DAY - 1
+        return self._map_ticks(end)
+
+    @property
+    def start_of_year(self):
+        """
+            Get the start date/time of the year of each date.
+
+                >>> DateArray([1234567890]).start_of_year
+                DateArray([Date(2009-01-01, 00:00:00)])
+
+            @rtype: DateArray
+            @return: New dates set to the beginning of their year
+        """
+        return DateArray.from_buckets(self.bucket("year"), "year")
+
+    @property
+    def end_of_year(self):
+        """
+            Get the end date/time of the year of each date.
+
+                >>> DateArray([1234567890]).end_of_year
+                DateArray([Date(2009-12-31, 23:59:59)])
+
+            @rtype: DateArray
+            @return: New dates set to the end of their year
+        """
+        return self._map_ticks(lambda t: (_date_to_days(date(
+                    _days_to_date(t // _US_PER_DAY).year, 12, 31)) + 1) * \
+                    _US_PER_DAY - 1)
+
+    @property
+    def day_tuple(self):
+        """
+            Get a tuple of two L{DateArray}s representing the start and end
+            of the day of each date.
+
+            @rtype: tuple
+            @return: (start, end) arrays of the day of each date
+        """
+        return (self.start_of_day, self.end_of_day)
+
+    @property
+    def week_tuple(self):
+        """
+            Get a tuple of two L{DateArray}s representing the start and end
+            of the week of each date.
+
+            @rtype: tuple
+            @return: (start, end) arrays of the week of each date
+        """
+        return (self.start_of_week, self.end_of_week)
+
+    @property
+    def month_tuple(self):
+        """
+            Get a tuple of two L{DateArray}s representing the start and end
+            of the month of each date.
+
+                >>> DateArray([1234567890]).month_tuple
+                (DateArray([Date(2009-02-01, 00:00:00)]), DateArray([Date(2009-02-28, 23:59:59)]))
+
+            @rtype: tuple
+            @return: (start, end) arrays of the month of each date
+        """
+        return (self.start_of_month, self.end_of_month)
+
+    @property
+    def year_tuple(self):
+        """
+            Get a tuple of two L{DateArray}s representing the start and end
+            of the year of each date.
+
+            @rtype: tuple
+            @return: (start, end) arrays of the year of each date
+        """
+        return (self.start_of_year, self.end_of_year)
+
+    def bucket(self, period = "day"):
+        """
+            Get the integer id of the day, week, month, quarter or year
+            containing each date in one pass, see L{Date.bucket}. The ids
+            are compact keys to group by; use L{from_buckets} to get the
+            start of each period back.
+
+                >>> a = DateArray([1234567890, datetime(2009, 3, 31),
+                ...                datetime(2009, 4, 1)])
+                >>> a.bucket("month").tolist()
+                [24109, 24110, 24111]
+                >>> a.bucket("quarter").tolist()
+                [8036, 8036, 8037]
+                >>> DateArray.from_buckets(a.bucket("quarter"), "quarter")
+                ...                             # doctest: +NORMALIZE_WHITESPACE
+                DateArray([Date(2009-01-01, 00:00:00), Date(2009-01-01, 00:00:00),
+                           Date(2009-04-01, 00:00:00)])
+
+            @type period: str
+            @param period: One of day, week, month, quarter or year
+            @rtype: array
+            @return: The id of the period of each date
+            @raise ValueError: If the period is invalid
+        """
+        if period == "day":
+            return array(_TICK_TYPECODE, [t // _US_PER_DAY for t in self.ticks])
+        elif period == "week":
+            return array(_TICK_TYPECODE, [(t // _US_PER_DAY + 3) // 7
+                                          for t in self.ticks])
+        elif period not in _PERIODS:
+            raise ValueError("Invalid period %r!" % period)
+
+        return self._map_days(lambda days: _days_to_period(days, period))
+
+    def floor(self, interval, origin = None):
+        """
+            Get a new array with each date set to the start of its fixed
+            interval, see L{Date.floor}.
+
+                >>> a = DateArray([1234567890, datetime(2009, 2, 14, 0, 45)])
+                >>> a.floor(Delta(minutes=15))
+                DateArray([Date(2009-02-14, 00:30:00), Date(2009-02-14, 00:45:00)])
+                >>> a.ceil(Delta(minutes=15))
+                DateArray([Date(2009-02-14, 00:45:00), Date(2009-02-14, 00:45:00)])
+                >>> a.round(Delta(hours=1))
+                DateArray([Date(2009-02-14, 01:00:00), Date(2009-02-14, 01:00:00)])
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: DateArray
+            @return: New dates at the start of their interval
+            @raise ValueError: If the interval is not positive
+            @raise OverflowError: If a result is out of range
+        """
+        step, origin = _get_interval(interval, origin)
+        return DateArray.from_ticks(_check_ticks(array(_TICK_TYPECODE,
+                    [t - (t - origin) % step for t in self.ticks])))
+
+    def ceil(self, interval, origin = None):
+        """
+            Get a new array with each date set to the end of its fixed
+            interval, see L{Date.ceil}.
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: DateArray
+            @return: New dates at the end of their interval
+            @raise ValueError: If the interval is not positive
+            @raise OverflowError: If a result is out of range
+        """
+        step, origin = _get_interval(interval, origin)
+        return DateArray.from_ticks(_check_ticks(array(_TICK_TYPECODE,
+                    [t + (origin - t) % step for t in self.ticks])))
+
+    def round(self, interval, origin = None):
+        """
+            Get a new array with each date set to the nearest interval
+            boundary, see L{Date.round}.
+
+            @type interval: Delta, timedelta or number of seconds
+            @param interval: The length of the intervals
+            @type origin: Date or anything L{Date} accepts
+            @param origin: The start of one of the intervals
+            @rtype: DateArray
+            @return: New dates at the nearest boundary
+            @raise ValueError: If the interval is not positive
+            @raise OverflowError: If a result is out of range
+        """
+        step, origin = _get_interval(interval, origin)
+        # Rounding is the floor of each date plus half an interval
+        half = step // 2
+        origin -= half
+        return DateArray.from_ticks(_check_ticks(array(_TICK_TYPECODE,
+                    [t + half - (t - origin) % step for t in self.ticks])))
+
+    def add(self, years = 0, months = 0, days = 0, hours = 0, minutes = 0,
+            seconds = 0):
+        """
+            Get a new array with a number of years, months, days, hours,
+            minutes or seconds added to each date, see L{Date.add}. Each
+            offset is either a single number for all dates or a sequence
+            with one number per date. Years and months are added first, and
+            if the day does not exist in the resulting month then the last
+            day of that month is used, like with relativedelta.
+
+                >>> a = DateArray([datetime(2009, 1, 31), datetime(2008, 2, 29)])
+                >>> a.add(months=1)
+                DateArray([Date(2009-02-28, 00:00:00), Date(2008-03-29, 00:00:00)])
+                >>> a.add(years=[1, 1], days=[0, 1], hours=12)
+                DateArray([Date(2010-01-31, 12:00:00), Date(2009-03-01, 12:00:00)])
+
+            @type years: int or sequence
+            @param years: The number of years to add
+            @type months: int or sequence
+            @param months: The number of months to add
+            @type days: int or sequence
+            @param days: The number of days to add
+            @type hours: int or sequence
+            @param hours: The number of hours to add
+            @type minutes: int or sequence
+            @param minutes: The number of minutes to add
+            @type seconds: int or sequence
+            @param seconds: The number of seconds to add
+            @rtype: DateArray
+            @return: New dates with the offsets added
+            @raise ValueError: If an offset sequence has the wrong length
+            @raise OverflowError: If a result is out of the range of datetime
+        """
+        count = len(self.ticks)
+        values = (years, months, days, hours, minutes, seconds)
+        offsets = []
+
+        for value in values:
+            if is_number(value):
+                offsets.append(itertools.repeat(value, count))
+            elif len(value) != count:
+                raise ValueError("Expected %d offsets, got %d!" %
+                                 (count, len(value)))
+            else:
+                offsets.append(value)
+
+        years, months, days, hours, minutes, seconds = offsets
+        ticks = self.ticks
+
+        # Time offsets in ticks
+        if any([not is_number(x) or x for x in values[2:]]):
+            deltas = [int(d * _US_PER_DAY + h * _US_PER_HOUR +
+                          m * _US_PER_MINUTE + s * _US_PER_SECOND)
+                      for d, h, m, s in zip(days, hours, minutes, seconds)]
+            ticks = [t + x for t, x in zip(ticks, deltas)]
+
+        def shift(day, months):
+            year, month, day = _days_to_civil(day)
+            year, month = divmod(year * 12 + month - 1 + months, 12)
+            month += 1
+
+            if not 1 <= year <= 9999:
+                raise OverflowError("date value out of range")
+
+            return _civil_to_days(year, month,
+                                  min(day, _days_in_month(year, month)))
+
+        result = array(_TICK_TYPECODE)
+        append = result.append
+        cache = {}
+
+        # The day part of the ticks is shifted by years and months before
+        # the time offsets are added, which is why they are split here
+        for t, y, m, x in zip(self.ticks, years, months, ticks):
+            if not (y or m):
+                append(x)
+                continue
+
+            day = t // _US_PER_DAY
+            key = (day, y * 12 + m)
+
+            try:
+                shifted = cache[key]
+            except KeyError:
+                shifted = cache[key] = shift(day, y * 12 + m)
+
+            append(x + (shifted - day) * _US_PER_DAY)
+
+        if result and not (_MIN_TICKS <= min(result) and
+                           max(result) <= _MAX_TICKS):
+            raise OverflowError("date value out of range")
+
+        return DateArray.from_ticks(result)
+
+    def strftime(self, format = "%d %b %Y"):
+        """
+            Convert each date to a string. See L{Date.strftime}.
+
+            @type format: str
+            @param format: The format string, see time.strftime(...)
+            @rtype: list
+            @return: The string representation of each date
+        """
+        return compile_strftime(format).format_many(self)
+
+class DeltaArray(object):
+    """
+        A compact, columnar sequence of deltas, e.g. durations or latencies,
+        stored as a single C{array} of 64-bit integer microseconds instead
+        of one L{Delta} object per value. Totals are computed for all values
+        at once and reductions like L{sum}, L{mean} and L{percentile} never
+        create a L{Delta} per value. Subtracting dates in a L{DateArray}
+        gives a DeltaArray.
+
+            >>> a = DeltaArray([Delta(1), Delta(minutes=2), timedelta(hours=1)])
+            >>> a
+            DeltaArray([Delta(1 second), Delta(2 minutes), Delta(1 hour)])
+            >>> a.total_seconds
+            array('d', [1.0, 120.0, 3600.0])
+            >>> a.sum()
+            Delta(1 hour, 2 minutes, 1 second)
+            >>> a.min(), a.max()
+            (Delta(1 second), Delta(1 hour))
+            >>> a.percentile(50)
+            Delta(2 minutes)
+
+        @type deltas: iterable or None
+        @param deltas: Values to store; each may be a L{Delta}, a timedelta
+                       or a number of seconds
+    """
+    def __init__(self, deltas = None):
+        self.ticks = array(_TICK_TYPECODE)
+
+        if deltas is not None:
+            self.extend(deltas)
+
+    @classmethod
+    def from_ticks(cls, ticks):
+        """
+            Create a new array directly from a sequence of microseconds. If
+            ticks is already an array of the right type it is used as-is and
+            not copied.
+
+                >>> DeltaArray.from_ticks([1500000])
+                DeltaArray([Delta(1 second)])
+
+            @type ticks: array or iterable of int
+            @param ticks: Microseconds of each delta
+            @rtype: DeltaArray
+            @return: A new array of deltas
+        """
+        value = cls()
+
+        if isinstance(ticks, array) and ticks.typecode == _TICK_TYPECODE:
+            value.ticks = ticks
+        else:
+            value.ticks.extend(ticks)
+
+        return value
+
+    def __repr__(self):
+        """
+            Return a nice string representation of this array. Long arrays
+            are abbreviated.
+
+                >>> DeltaArray([1] * 10)     # doctest: +ELLIPSIS
+                DeltaArray([Delta(1 second), ..., Delta(1 second)])
+
+        """
+        if len(self) > 6:
+            items = [repr(self[x]) for x in (0, 1, 2)] + ["..."] + \
+                    [repr(self[x]) for x in (-3, -2, -1)]
+        else:
+            items = [repr(x) for x in self]
+
+        return "DeltaArray([%s])" % ", ".join(items)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __iter__(self):
+        for ticks in self.ticks:
+            yield Delta.from_microseconds(ticks)
+
+    def __getitem__(self, index):
+        """
+            Get a single L{Delta} or, when passed a slice, a new
+            L{DeltaArray}.
+
+            @type index: int or slice
+            @param index: The index or slice to get
+            @rtype: Delta or DeltaArray
+            @return: The delta at index or the deltas in the slice
+        """
+        if isinstance(index, slice):
+            return DeltaArray.from_ticks(self.ticks[index])
+
+        return Delta.from_microseconds(self.ticks[index])
+
+    def append(self, value):
+        """
+            Append a single delta to the end of this array.
+
+            @type value: Delta, timedelta or number
+            @param value: The delta to append
+        """
+        self.ticks.append(_to_delta_ticks(value))
+
+    def extend(self, values):
+        """
+            Append a number of deltas to the end of this array.
+
+            @type values: iterable
+            @param values: Deltas, timedeltas or numbers of seconds
+        """
+        if isinstance(values, DeltaArray):
+            self.ticks.extend(values.ticks)
+        else:
+            self.ticks.extend([_to_delta_ticks(x) for x in values])
+
+    def _totals(self, unit):
+        unit = float(unit)
+        return array("d", [x / unit for x in self.ticks])
+
+    @property
+    def total_microseconds(self):
+        """
+            Get the total number of microseconds of each delta.
+
+            @rtype: array
+            @return: The totals as floats
+        """
+        return array("d", self.ticks)
+
+    @property
+    def total_seconds(self):
+        """
+            Get the total number of seconds of each delta.
+
+            @rtype: array
+            @return: The totals as floats
+        """
+        return self._totals(_US_PER_SECOND)
+
+    @property
+    def total_minutes(self):
+        """
+            Get the total number of minutes of each delta.
+
+            @rtype: array
+            @return: The totals as floats
+        """
+        return self._totals(_US_PER_MINUTE)
+
+    @property
+    def total_hours(self):
+        """
+            Get the total number of hours of each delta.
+
+                >>> DeltaArray([5400]).total_hours
+                array('d', [1.5])
+
+            @rtype: array
+            @return: The totals as floats
+        """
+        return self._totals(_US_PER_HOUR)
+
+    @property
+    def total_days(self):
+        """
+            Get the total number of days of each delta.
+
+            @rtype: array
+            @return: The totals as floats
+        """
+        return self._totals(_US_PER_DAY)
+
+    def _check_empty(self):
+        if not self.ticks:
+            raise ValueError("The array is empty!")
+
+    def sum(self):
+        """
+            Get the sum of all deltas.
+
+            @rtype: Delta
+            @return: The sum, exact to the microsecond
+        """
+        return Delta.from_microseconds(sum(self.ticks))
+
+    def mean(self):
+        """
+            Get the mean of all deltas, rounded to the nearest microsecond.
+
+                >>> DeltaArray([1, 2]).mean().total_seconds
+                1.5
+
+            @rtype: Delta
+            @return: The mean
+            @raise ValueError: If the array is empty
+        """
+        self._check_empty()
+        quotient, remainder = divmod(sum(self.ticks), len(self.ticks))
+        if remainder * 2 >= len(self.ticks):
+            quotient += 1
+        return Delta.from_microseconds(quotient)
+
+    def min(self):
+        """
+            Get the shortest delta.
+
+            @rtype: Delta
+            @return: The minimum
+            @raise ValueError: If the array is empty
+        """
+        self._check_empty()
+        return Delta.from_microseconds(min(self.ticks))
+
+    def max(self):
+        """
+            Get the longest delta.
+
+            @rtype: Delta
+            @return: The maximum
+            @raise ValueError: If the array is empty
+        """
+        self._check_empty()
+        return Delta.from_microseconds(max(self.ticks))
+
+    def percentile(self, q):
+        """
+            Get one or more percentiles of the deltas, interpolating linearly
+            between the two nearest values and rounding to the nearest
+            microsecond. Pass a sequence of percentiles to sort the values
+            only once.
+
+                >>> a = DeltaArray(range(1, 101))
+                >>> a.percentile(50).total_seconds
+                50.5
+                >>> a.percentile([0, 90, 100])
+                [Delta(1 second), Delta(1 minute, 30 seconds), Delta(1 minute, 40 seconds)]
+
+            @type q: number or sequence
+            @param q: Percentiles between 0 and 100
+            @rtype: Delta or list
+            @return: The delta at each percentile
+            @raise ValueError: If the array is empty or q is out of range
+        """
+        self._check_empty()
+        values = sorted(self.ticks)
+        last = len(values) - 1
+        result = []
+
+        for x in ([q] if is_number(q) else q):
+            if not 0 <= x <= 100:
+                raise ValueError("Percentiles must be between 0 and 100!")
+
+            position = x * last / 100.0
+            index = int(position)
+            value = values[index]
+
+            if index < last:
+                value += int(round((values[index + 1] - value) *
+                                   (position - index)))
+
+            result.append(Delta.from_microseconds(value))
+
+        return result[0] if is_number(q) else result
+
+    def histogram(self, bins = 10, limits = None):
+        """
+            Count the deltas in a number of bins. Like numpy.histogram,
+            every bin is half-open except the last, which also includes its
+            upper edge, and values outside of the bins are not counted.
+
+                >>> counts, edges = DeltaArray([1, 2, 2, 3, 10]).histogram(3)
+                >>> counts
+                [4, 0, 1]
+                >>> edges
+                DeltaArray([Delta(1 second), Delta(4 seconds), Delta(7 seconds), Delta(10 seconds)])
+                >>> DeltaArray([1, 2, 2, 3, 10]).histogram([0, 2, 5])[0]
+                [1, 3]
+                >>> DeltaArray([0, 0.333333, 1]).histogram(3)[0]
+                [1, 1, 1]
+
+            @type bins: int or sequence
+            @param bins: The number of equal-width bins or a sorted sequence
+                         of bin edges (Deltas, timedeltas or seconds)
+            @type limits: tuple
+            @param limits: The (lower, upper) range of equal-width bins,
+                           defaults to the min and max delta
+            @rtype: tuple
+            @return: A list of counts and a L{DeltaArray} of bin edges
+            @raise ValueError: If there are no bins
+        """
+        if is_number(bins):
+            if bins < 1:
+                raise ValueError("There must be at least one bin!")
+
+            if limits is not None:
+                low, high = [_to_delta_ticks(x) for x in limits]
+            elif self.ticks:
+                low, high = min(self.ticks), max(self.ticks)
+            else:
+                low, high = 0, 0
+
+            if low == high:
+                high += 1
+
+            # Values are placed by the rounded edges below, so that the
+            # counts always match the edges returned
+            width = high - low
+            edges = [low + width * i // bins for i in range(bins)] + [high]
+        else:
+            edges = [_to_delta_ticks(x) for x in bins]
+            if len(edges) < 2:
+                raise ValueError("There must be at least one bin!")
+
+        counts = [0] * (len(edges) - 1)
+        low, high = edges[0], edges[-1]
+        search = bisect.bisect_right
+
+        for x in self.ticks:
+            if low <= x < high:
+                counts[search(edges, x) - 1] += 1
+            elif x == high:
+                counts[-1] += 1
+
+        return counts, DeltaArray.from_ticks(edges)
+
+def date_range(start, end, step = None):
+    """
+        Get a lazy, half-open range of dates from start up to but not
+        including end, see L{DateRange}.
+
+            >>> list(date_range(datetime(2009, 1, 30), datetime(2009, 2, 2)))
+            [Date(2009-01-30, 00:00:00), Date(2009-01-31, 00:00:00), Date(2009-02-01, 00:00:00)]
+
+        @type start: Date or anything L{Date} accepts
+        @param start: The first date
+        @type end: Date or anything L{Date} accepts
+        @param end: The date to stop before
+        @type step: Delta, timedelta, relativedelta or number
+        @param step: The step between dates, one day by default
+        @rtype: DateRange
+        @return: The range of dates
+    """
+    return DateRange(start, end, step)
+
+
+class DateRange(object):
+    """
+        A lazy, half-open range of dates from start up to but not including
+        end, like Python's range. Only the start, end and step are stored,
+        and the length and each date are computed arithmetically, so ranges
+        of any size take constant memory and len() and indexing don't
+        iterate.
+
+        The step is either fixed (a L{Delta}, timedelta or number of
+        seconds) or a relativedelta with only years and months. Calendar
+        steps are anchored at the start, so stepping monthly from the 31st
+        gives the last day of shorter months without drifting:
+
+            >>> r = date_range(datetime(2009, 1, 31), datetime(2010, 1, 1),
+            ...                relativedelta(months=1))
+            >>> len(r)
+            12
+            >>> r[1], r[2], r[-1]
+            (Date(2009-02-28, 00:00:00), Date(2009-03-31, 00:00:00), Date(2009-12-31, 00:00:00))
+
+            >>> r = date_range(datetime(2009, 1, 1), datetime(2009, 1, 2), Delta(hours=-6))
+            >>> len(r), list(r)
+            (0, [])
+            >>> r = date_range(datetime(2009, 1, 2), datetime(2009, 1, 1), Delta(hours=-6))
+            >>> len(r), r[3]
+            (4, Date(2009-01-01, 06:00:00))
+
+        @type start: Date or anything L{Date} accepts
+        @param start: The first date
+        @type end: Date or anything L{Date} accepts
+        @param end: The date to stop before
+        @type step: Delta, timedelta, relativedelta or number
+        @param step: The step between dates, one day by default
+        @raise ValueError: If the step is zero or not supported
+    """
+    def __init__(self, start, end, step = None):
+        self.start = Date.from_ticks(_to_ticks(start))
+        self.end = Date.from_ticks(_to_ticks(end))
+        self.step = Delta(days=1) if step is None else step
+
+        self._months = None
+        self._step = None
+
+        if isinstance(self.step, relativedelta):
+            step = self.step
+            if step.days or step.hours or step.minutes or step.seconds or \
+               step.microseconds or step.leapdays or step.weekday or \
+               step._has_time or step.year or step.month or step.day:
+                raise ValueError("Only relativedelta steps of years and "
+                                 "months are supported!")
+            self._months = step.years * 12 + step.months
+            if not self._months:
+                raise ValueError("The step must not be zero!")
+
+            start = self.start.ticks
+            self._year, self._month, self._day = \
+                _days_to_civil(start // _US_PER_DAY)
+            self._time = start % _US_PER_DAY
+        else:
+            self._step = _to_delta_ticks(self.step)
+            if not self._step:
+                raise ValueError("The step must not be zero!")
+
+        self._length = self._get_length()
+
+    def _ticks_at(self, index):
+        """
+            Get the ticks of the date at a non-negative index, which may be
+            past the end of this range.
+        """
+        if self._step is not None:
+            return self.start.ticks + index * self._step
+
+        year, month = divmod(self._year * 12 + self._month - 1 +
+                             index * self._months, 12)
+        month += 1
+
+        if not 1 <= year <= 9999:
+            raise OverflowError("date value out of range")
+
+        return _civil_to_days(year, month, min(self._day, _days_in_month(
+                   year, month))) * _US_PER_DAY + self._time
+
+    def _get_length(self):
+        start, end = self.start.ticks, self.end.ticks
+        forward = (self._step or self._months) > 0
+
+        if (start >= end) if forward else (start <= end):
+            return 0
+
+        if self._step is not None:
+            return (end - start + self._step + (-1 if forward else 1)) // \
+                   self._step
+
+        # Estimate from the months in between; calendar steps are strictly
+        # monotonic, so stepping to the exact length takes few tries
+        year, month = _days_to_civil(end // _US_PER_DAY)[:2]
+        length = max(((year - self._year) * 12 + month - self._month) //
+                     self._months, 0)
+
+        def inside(index):
+            try:
+                ticks = self._ticks_at(index)
+            except OverflowError:
+                return False
+            return ticks < end if forward else ticks > end
+
+        while inside(length):
+            length += 1
+        while length > 0 and not inside(length - 1):
+            length -= 1
+
+        return length
+
+    def __repr__(self):
+        return "DateRange(%r, %r, %r)" % (self.start, self.end, self.step)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield Date.from_ticks(self._ticks_at(index))
+
+    def __getitem__(self, index):
+        """
+            Get a single L{Date} or, when passed a slice, a L{DateArray}.
+
+                >>> r = date_range(datetime(2009, 1, 1), datetime(2010, 1, 1))
+                >>> r[364]
+                Date(2009-12-31, 00:00:00)
+                >>> r[::100]        # doctest: +NORMALIZE_WHITESPACE
+                DateArray([Date(2009-01-01, 00:00:00), Date(2009-04-11, 00:00:00),
+                           Date(2009-07-20, 00:00:00), Date(2009-10-28, 00:00:00)])
+
+            @type index: int or slice
+            @param index: The index or slice to get
+            @rtype: Date or DateArray
+            @return: The date at index or the dates in the slice
+            @raise IndexError: If index is out of range
+        """
+        if isinstance(index, slice):
+            return DateArray.from_ticks(array(_TICK_TYPECODE, [
+                self._ticks_at(x) for x in range(*index.indices(self._length))]))
+
+        if index < 0:
+            index += self._length
+
+        if not 0 <= index < self._length:
+            raise IndexError("DateRange index out of range")
+
+        return Date.from_ticks(self._ticks_at(index))
+
+    def to_array(self):
+        """
+            Get all dates in this range as a L{DateArray}.
+
+            @rtype: DateArray
+            @return: The dates
+        """
+        if self._step is not None:
+            start = self.start.ticks
+            return DateArray.from_ticks(array(_TICK_TYPECODE, range(
+                start, start + self._length * self._step, self._step)))
+
+        return self[:]
+
+# Recurrence frequencies, as in RFC 5545 and dateutil.rrule
+YEARLY, MONTHLY, WEEKLY, DAILY = range(4)
+
+# Periods to search for an occurrence before giving up, i.e. 400 years,
+# after which the Gregorian calendar repeats
+_RECURRENCE_SEARCH = {YEARLY: 400, MONTHLY: 4800, WEEKLY: 20871,
+                      DAILY: 146097}
+
+_RECURRENCE_CACHE_SIZE = 4096
+
+
+class Recurrence(object):
+    """
+        A recurring date rule like "the 2nd Tuesday of every month", built
+        on the relativedelta weekday instances (MO, TU(+2), FR(-1), ...) and
+        following the RFC 5545 / dateutil.rrule rules for the supported
+        parts. Each occurrence has the time of day of start.
+
+        Occurrences are generated per period (a year, month, week or day,
+        every interval periods), and the expanded occurrences of each period
+        are cached. When every period has the same number of occurrences,
+        e.g. for TU(+2) or bymonthday=15, the nth occurrence and the next
+        occurrence after a date are computed directly instead of by
+        iterating from the start.
+
+            >>> r = Recurrence(MONTHLY, datetime(2009, 1, 1, 9), byweekday=TU(+2),
+            ...                until=datetime(2030, 1, 1))
+            >>> r[0], r[1]
+            (Date(2009-01-13, 09:00:00), Date(2009-02-10, 09:00:00))
+            >>> r.after(Date(1234567890))
+            Date(2009-03-10, 09:00:00)
+            >>> len(list(r)), r[-1]
+            (252, Date(2029-12-11, 09:00:00))
+
+            >>> r = Recurrence(MONTHLY, datetime(2009, 1, 31), count=4)
+            >>> list(r)         # doctest: +NORMALIZE_WHITESPACE
+            [Date(2009-01-31, 00:00:00), Date(2009-03-31, 00:00:00),
+             Date(2009-05-31, 00:00:00), Date(2009-07-31, 00:00:00)]
+
+            >>> r = Recurrence(YEARLY, datetime(2009, 1, 1), bymonth=(2, 8),
+            ...                byweekday=FR(-1), interval=2)
+            >>> r[:3]           # doctest: +NORMALIZE_WHITESPACE
+            DateArray([Date(2009-02-27, 00:00:00), Date(2009-08-28, 00:00:00),
+                       Date(2011-02-25, 00:00:00)])
+
+        @type freq: int
+        @param freq: One of YEARLY, MONTHLY, WEEKLY or DAILY
+        @type start: Date or anything L{Date} accepts
+        @param start: The first possible occurrence
+        @type interval: int
+        @param interval: Only use every interval-th period
+        @type count: int
+        @param count: The maximum number of occurrences
+        @type until: Date or anything L{Date} accepts
+        @param until: The last possible occurrence
+        @type bymonth: int or sequence
+        @param bymonth: The months (1-12) to use
+        @type byweekday: weekday, int or sequence
+        @param byweekday: The weekdays (MO, TU, ... or 0-6) to use. With n
+                          set, e.g. TU(+2) or FR(-1), the nth weekday of the
+                          month (MONTHLY, or YEARLY with bymonth) or year
+        @type bymonthday: int or sequence
+        @param bymonthday: The days of the month to use; negative values
+                           count from the end of the month
+        @raise ValueError: If a parameter is invalid
+    """
+    def __init__(self, freq, start, interval = 1, count = None, until = None,
+                 bymonth = None, byweekday = None, bymonthday = None):
+        if freq not in _RECURRENCE_SEARCH:
+            raise ValueError("Invalid frequency %r!" % freq)
+        elif interval < 1:
+            raise ValueError("The interval must be positive!")
+
+        self.freq = freq
+        self.start = Date.from_ticks(_to_ticks(start))
+        self.interval = interval
+        self.count = count
+        self.until = None if until is None else \
+                     Date.from_ticks(_to_ticks(until))
+
+        start = self.start.ticks
+        self._day = start // _US_PER_DAY
+        self._time = start % _US_PER_DAY
+        year, month, day = _days_to_civil(self._day)
+
+        bymonth = self._get_list(bymonth)
+        bymonthday = self._get_list(bymonthday)
+        byweekday = [(x.weekday, x.n or None) if isinstance(x, weekday)
+                     else (x, None) for x in self._get_list(byweekday)]
+
+        # Defaults from the start date, like dateutil.rrule
+        if not (bymonthday or byweekday):
+            if freq == YEARLY:
+                bymonth = bymonth or [month]
+                bymonthday = [day]
+            elif freq == MONTHLY:
+                bymonthday = [day]
+            elif freq == WEEKLY:
+                byweekday = [(((self._day + 3) % 7), None)]
+
+        self._bymonth = sorted(set(bymonth))
+        self._bymonthday = sorted(set(bymonthday))
+        self._byweekday = sorted(set([x for x in byweekday if x[1] is None]))
+        self._bynweekday = sorted(set([x for x in byweekday
+                                       if x[1] is not None]))
+
+        if [x for x in self._bymonth if not 1 <= x <= 12] or \
+           [x for x in self._bymonthday if not 1 <= abs(x) <= 31] or \
+           [x for x in byweekday if not 0 <= x[0] <= 6]:
+            raise ValueError("Invalid month, day of the month or weekday!")
+        elif self._bynweekday and freq not in (YEARLY, MONTHLY):
+            raise ValueError("Weekdays with n are only supported for "
+                             "YEARLY and MONTHLY rules!")
+
+        self._first = self._get_period(self._day)
+        self._per_period = self._get_per_period()
+        self._cache = {}
+        self._skipped = len([x for x in self._get_period_ticks(self._first)
+                             if x < start])
+
+    @staticmethod
+    def _get_list(value):
+        if value is None:
+            return []
+        elif isinstance(value, (list, tuple, set)):
+            return list(value)
+        return [value]
+
+    def _get_period(self, day):
+        """
+            Get the number of the period containing a day.
+        """
+        if self.freq == DAILY:
+            return day
+        elif self.freq == WEEKLY:
+            # Weeks start on Monday; 1970-01-01 was a Thursday
+            return (day + 3) // 7
+
+        year, month = _days_to_civil(day)[:2]
+        if self.freq == MONTHLY:
+            return year * 12 + month - 1
+        return year
+
+    def _get_per_period(self):
+        """
+            Get the number of occurrences in every period, or None if it
+            depends on the period.
+        """
+        monthdays = self._bymonthday
+        weekdays = self._byweekday
+        nweekdays = self._bynweekday
+        same_sign = lambda values: min(values) > 0 or max(values) < 0
+
+        def per_month():
+            if monthdays and not (weekdays or nweekdays):
+                if same_sign(monthdays) and max(map(abs, monthdays)) <= 28:
+                    return len(monthdays)
+            elif nweekdays and not (weekdays or monthdays):
+                counts = [x[1] for x in nweekdays]
+                if same_sign(counts) and max(map(abs, counts)) <= 4:
+                    return len(nweekdays)
+            return None
+
+        if self.freq == DAILY:
+            if not (self._bymonth or monthdays or weekdays):
+                return 1
+        elif self.freq == WEEKLY:
+            if not (self._bymonth or monthdays):
+                return len(weekdays)
+        elif self.freq == MONTHLY:
+            if not self._bymonth:
+                return per_month()
+        elif self._bymonth:
+            count = per_month()
+            if count is not None:
+                return count * len(self._bymonth)
+        elif nweekdays and not (weekdays or monthdays):
+            counts = [x[1] for x in nweekdays]
+            if same_sign(counts) and max(map(abs, counts)) <= 52:
+                return len(nweekdays)
+        elif monthdays and not (weekdays or nweekdays):
+            if same_sign(monthdays) and max(map(abs, monthdays)) <= 28:
+                return len(monthdays) * 12
+
+        return None
+
+    def _get_days(self, first, count, nth_first, nth_count):
+        """
+            Get the days from first to first + count which match the
+            weekday and day of the month rules. Weekdays with n are counted
+            from nth_first to nth_first + nth_count.
+        """
+        days = None
+
+        if self._bymonthday:
+            year, month = _days_to_civil(first)[:2]
+            length = _days_in_month(year, month)
+            days = set([first + (x if x > 0 else length + x + 1) - 1
+                        for x in self._bymonthday if abs(x) <= length])
+
+        if self._byweekday or self._bynweekday:
+            matches = set()
+
+            for wd, n in self._byweekday:
+                offset = (wd - (first + 3)) % 7
+                matches.update(range(first + offset, first + count, 7))
+
+            for wd, n in self._bynweekday:
+                if n > 0:
+                    day = nth_first + (wd - (nth_first + 3)) % 7 + (n - 1) * 7
+                else:
+                    last = nth_first + nth_count - 1
+                    day = last - ((last + 3) - wd) % 7 + (n + 1) * 7
+                if nth_first <= day < nth_first + nth_count:
+                    matches.add(day)
+
+            days = matches if days is None else days & matches
+
+        if days is None:
+            return range(first, first + count)
+
+        return [x for x in days if first <= x < first + count]
+
+    def _get_period_ticks(self, period):
+        """
+            Get the sorted ticks of all dates in a period which match the
+            rules, or None if the period is out of the range of datetime.
+        """
+        freq = self.freq
+        days = []
+
+        if freq == DAILY or freq == WEEKLY:
+            first = period if freq == DAILY else period * 7 - 3
+            length = 1 if freq == DAILY else 7
+
+            if not _MIN_TICKS <= first * _US_PER_DAY <= _MAX_TICKS:
+                return None
+
+            for day in range(first, first + length):
+                year, month, monthday = _days_to_civil(day)
+                if self._bymonth and month not in self._bymonth:
+                    continue
+                elif self._bymonthday or self._byweekday:
+                    if day not in self._get_days(day - monthday + 1,
+                                                 _days_in_month(year, month),
+                                                 0, 0):
+                        continue
+                days.append(day)
+        else:
+            if freq == MONTHLY:
+                year, month = divmod(period, 12)
+                months = [month + 1]
+            else:
+                year = period
+                months = self._bymonth or range(1, 13)
+
+            if not 1 <= year <= 9999:
+                return None
+
+            if freq == YEARLY and not self._bymonth and self._bynweekday:
+                # Weekdays with n count within the whole year
+                first = _civil_to_days(year, 1, 1)
+                length = 365 + _LEAP_YEARS[year]
+
+                for month in months:
+                    start = _civil_to_days(year, month, 1)
+                    days.extend(self._get_days(start,
+                                               _days_in_month(year, month),
+                                               first, length))
+            else:
+                for month in months:
+                    if self._bymonth and month not in self._bymonth:
+                        continue
+                    start = _civil_to_days(year, month, 1)
+                    length = _days_in_month(year, month)
+                    days.extend(self._get_days(start, length, start, length))
+
+        return [x * _US_PER_DAY + self._time for x in sorted(days)]
+
+    def _expand_period(self, period):
+        """
+            Get the sorted ticks of all occurrences in a period, or None if
+            the period is out of the range of datetime. Periods are cached.
+        """
+        try:
+            return self._cache[period]
+        except KeyError:
+            pass
+
+        ticks = self._get_period_ticks(period)
+
+        if ticks is None:
+            return None
+        elif period == self._first:
+            ticks = [x for x in ticks if x >= self.start.ticks]
+
+        if len(self._cache) >= _RECURRENCE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[period] = ticks
+        return ticks
+
+    def _check(self, ticks, index):
+        """
+            Check an occurrence against count and until.
+        """
+        if self.count is not None and index >= self.count:
+            return False
+        elif self.until is not None and ticks > self.until.ticks:
+            return False
+        return True
+
+    def _iter_ticks(self, period = 0, index = 0):
+        """
+            Generate (ticks, index) of all occurrences from the nth period
+            on, where index is the number of occurrences before it.
+        """
+        empty = 0
+        limit = _RECURRENCE_SEARCH[self.freq] // self.interval + 1
+
+        while empty < limit:
+            ticks = self._expand_period(self._first + period * self.interval)
+            if ticks is None:
+                return
+
+            empty = 0 if ticks else empty + 1
+
+            for value in ticks:
+                if not self._check(value, index):
+                    return
+                yield value, index
+                index += 1
+
+            period += 1
+
+    def __iter__(self):
+        for ticks, index in self._iter_ticks():
+            yield Date.from_ticks(ticks)
+
+    def _nth_ticks(self, index):
+        if self._per_period:
+            period, position = divmod(index + self._skipped,
+                                      self._per_period)
+            if not period:
+                # The cached first period starts at start
+                position -= self._skipped
+
+            ticks = self._expand_period(self._first + period * self.interval)
+
+            if ticks is None or not self._check(ticks[position], index):
+                return None
+
+            return ticks[position]
+
+        for ticks, position in self._iter_ticks():
+            if position == index:
+                return ticks
+
+        return None
+
+    def _get_all(self):
+        """
+            Get a list of all occurrences, which needs count or until as
+            otherwise they only end with the range of datetime.
+        """
+        if self.count is None and self.until is None:
+            raise IndexError("Recurrence without count or until has no end")
+
+        return list(self)
+
+    def __getitem__(self, index):
+        """
+            Get the nth occurrence or, when passed a slice, a L{DateArray}
+            of occurrences. Negative indices and slices without a stop need
+            count or until.
+
+                >>> Recurrence(DAILY, datetime(2009, 1, 1))[-1]
+                Traceback (most recent call last):
+                    ...
+                IndexError: Recurrence without count or until has no end
+
+            @type index: int or slice
+            @param index: The index or slice to get
+            @rtype: Date or DateArray
+            @return: The occurrence or occurrences
+            @raise IndexError: If there is no such occurrence, or the index
+                               needs count or until and neither is set
+        """
+        if isinstance(index, slice):
+            if (index.start or 0) < 0 or index.stop is None or \
+               index.stop < 0 or (index.step or 1) < 0:
+                values = self._get_all()[index]
+                return DateArray.from_ticks([x.ticks for x in values])
+
+            return DateArray.from_ticks([x for x, i in itertools.islice(
+                self._iter_ticks(), index.start, index.stop, index.step)])
+
+        if index < 0:
+            return self._get_all()[index]
+
+        ticks = self._nth_ticks(index)
+        if ticks is None:
+            raise IndexError("Recurrence index out of range")
+
+        return Date.from_ticks(ticks)
+
+    def nth(self, index):
+        """
+            Get the nth occurrence, counting from zero, see L{__getitem__}.
+
+                >>> Recurrence(WEEKLY, datetime(2009, 1, 1), byweekday=(MO, FR)).nth(1000)
+                Date(2018-08-03, 00:00:00)
+
+            @type index: int
+            @param index: The index of the occurrence
+            @rtype: Date
+            @return: The occurrence
+            @raise IndexError: If there is no such occurrence
+        """
+        return self[index]
+
+    def after(self, value, inclusive = False):
+        """
+            Get the first occurrence after a date.
+
+                >>> r = Recurrence(MONTHLY, datetime(2009, 1, 1), bymonthday=-1)
+                >>> r.after(datetime(2009, 2, 28))
+                Date(2009-03-31, 00:00:00)
+                >>> r.after(datetime(2009, 2, 28), inclusive=True)
+                Date(2009-02-28, 00:00:00)
+
+            @type value: Date or anything L{Date} accepts
+            @param value: The date to search after
+            @type inclusive: bool
+            @param inclusive: Whether value itself may be returned
+            @rtype: Date or None
+            @return: The next occurrence or None if there is none
+        """
+        ticks = _to_ticks(value)
+
+        if ticks < self.start.ticks:
+            period = 0
+        else:
+            period = (self._get_period(ticks // _US_PER_DAY) -
+                      self._first) // self.interval
+
+        found = None
+        search = bisect.bisect_left if inclusive else bisect.bisect_right
+        empty = 0
+        limit = _RECURRENCE_SEARCH[self.freq] // self.interval + 1
+
+        while empty < limit:
+            values = self._expand_period(self._first + period * self.interval)
+            if values is None:
+                return None
+
+            position = search(values, ticks)
+            if position < len(values):
+                found = values[position]
+                break
+
+            empty += 1
+            period += 1
+        else:
+            return None
+
+        if self.count is not None:
+            if self._per_period:
+                index = period * self._per_period + position - \
+                        (self._skipped if period else 0)
+            else:
+                index = sum([len(self._expand_period(self._first + x *
+                                                     self.interval))
+                             for x in range(period)]) + position
+        else:
+            index = 0
+
+        if not self._check(found, index):
+            return None
+
+        return Date.from_ticks(found)
+
+# Cron fields as (name, lowest, highest, names of the values from lowest)
+_CRON_FIELDS = (
+    ("minute", 0, 59, None),
+    ("hour", 0, 23, None),
+    ("day of the month", 1, 31, None),
+    ("month", 1, 12, ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug",
+                      "sep", "oct", "nov", "dec")),
+    ("day of the week", 0, 7, ("sun", "mon", "tue", "wed", "thu", "fri",
+                               "sat")),
+)
+
+_CRON_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# Repeats a 7 bit weekday pattern over 35 days
+_CRON_WEEKS = sum([1 << (7 * x) for x in range(5)])
+
+_CRON_CACHE_SIZE = 4096
+_cron_cache = {}
+
+def _next_bit(mask, index):
+    """
+        Get the lowest set bit of mask at or above index, or None.
+    """
+    mask >>= index
+    if not mask:
+        return None
+    return index + (mask & -mask).bit_length() - 1
+
+def _prev_bit(mask, index):
+    """
+        Get the highest set bit of mask at or below index, or None.
+    """
+    if index < 0:
+        return None
+    mask &= (2 << index) - 1
+    if not mask:
+        return None
+    return mask.bit_length() - 1
+
+def compile_cron(expression):
+    """
+        Get a compiled L{CronExpression}. Expressions are cached per string
+        so that many schedules sharing an expression only compile it once.
+
+            >>> compile_cron("*/5 * * * *") is compile_cron("*/5 * * * *")
+            True
+
+        @type expression: str
+        @param expression: The cron expression
+        @rtype: CronExpression
+        @return: The compiled expression
+        @raise ValueError: If the expression is invalid
+    """
+    try:
+        return _cron_cache[expression]
+    except KeyError:
+        if len(_cron_cache) >= _CRON_CACHE_SIZE:
+            _cron_cache.clear()
+        cron = _cron_cache[expression] = CronExpression(expression)
+        return cron
+
+def cron_next_many(expressions, value):
+    """
+        Get the next time after a date for many cron expressions at once.
+        The date is only split into its fields once and the result is only
+        computed once per distinct expression. See
+        L{CronExpression.next_after}.
+
+            >>> cron_next_many(["0 9 * * 1-5", "*/15 * * * *", "0 9 * * 1-5"],
+            ...                Date(1234567890))        # doctest: +NORMALIZE_WHITESPACE
+            DateArray([Date(2009-02-16, 09:00:00), Date(2009-02-14, 00:45:00),
+                       Date(2009-02-16, 09:00:00)])
+
+        Strings are compiled with L{compile_cron}; when evaluating more
+        distinct expressions than it caches, pass compiled expressions.
+
+        @type expressions: iterable
+        @param expressions: Cron expressions as strings or L{CronExpression}
+        @type value: Date or anything L{Date} accepts
+        @param value: The date to search after
+        @rtype: DateArray
+        @return: The next time of each expression
+        @raise OverflowError: If an expression has no next time
+    """
+    return _cron_many(expressions, value, False)
+
+def cron_prev_many(expressions, value):
+    """
+        Get the last time before a date for many cron expressions at once.
+        See L{cron_next_many} and L{CronExpression.prev_before}.
+
+            >>> cron_prev_many(["0 9 * * 1-5", "@monthly"], Date(1234567890))
+            DateArray([Date(2009-02-13, 09:00:00), Date(2009-02-01, 00:00:00)])
+
+        @type expressions: iterable
+        @param expressions: Cron expressions as strings or L{CronExpression}
+        @type value: Date or anything L{Date} accepts
+        @param value: The date to search before
+        @rtype: DateArray
+        @return: The last time of each expression
+        @raise OverflowError: If an expression has no previous time
+    """
+    return _cron_many(expressions, value, True)
+
+def _cron_many(expressions, value, before):
+    fields = CronExpression._split_ticks(_to_ticks(value), before)
+    results = {}
+    ticks = array(_TICK_TYPECODE)
+
+    for expression in expressions:
+        if not isinstance(expression, CronExpression):
+            expression = compile_cron(expression)
+
+        key = expression._key
+        try:
+            result = results[key]
+        except KeyError:
+            if before:
+                result = expression._prev_ticks(*fields)
+            else:
+                result = expression._next_ticks(*fields)
+            if result is None:
+                raise OverflowError("Cron expression %r has no matching "
+                                    "time!" % expression.expression)
+            results[key] = result
+
+        ticks.append(result)
+
+    return DateArray.from_ticks(ticks)
+
+
+class CronExpression(object):
+    """
+        A cron expression compiled into one bitset per field. The next or
+        previous matching time is found by jumping to the next set bit of
+        each field in turn from the month down to the minute, so a search
+        takes a handful of steps however far away the match is. Use
+        L{compile_cron} to get a cached expression and L{cron_next_many} to
+        evaluate many expressions at once.
+
+        The five fields are minute, hour, day of the month, month and day of
+        the week, each a *, a value, a range like 1-5 or a comma separated
+        list of those, optionally with a step like */15 or 8-18/2. Months
+        and weekdays may be given by their English abbreviations, and both 0
+        and 7 are Sunday. The @yearly, @monthly, @weekly, @daily and
+        @hourly aliases are supported. As in Vixie cron, when both the day
+        of the month and the day of the week are restricted a day matches
+        if either of them does.
+
+        Times are wall-clock times just like L{Date}.
+
+            >>> cron = CronExpression("30 9 * * mon-fri")
+            >>> cron.next_after(Date(1234567890))
+            Date(2009-02-16, 09:30:00)
+            >>> cron.prev_before(Date(1234567890))
+            Date(2009-02-13, 09:30:00)
+
+            >>> CronExpression("0 0 29 2 *").next_after(datetime(2009, 1, 1))
+            Date(2012-02-29, 00:00:00)
+            >>> CronExpression("0 12 13 * fri").next_after(datetime(2009, 1, 1))
+            Date(2009-01-02, 12:00:00)
+
+            >>> CronExpression("0 0 31 2 *")
+            Traceback (most recent call last):
+                ...
+            ValueError: Cron expression '0 0 31 2 *' never matches!
+
+        @type expression: str
+        @param expression: The cron expression
+        @raise ValueError: If the expression is invalid or never matches
+    """
+    def __init__(self, expression):
+        self.expression = expression
+
+        parts = _CRON_ALIASES.get(expression.strip().lower(),
+                                  expression).split()
+        if len(parts) != 5:
+            raise ValueError("Invalid cron expression %r!" % expression)
+
+        masks = [self._parse_field(part, field)
+                 for part, field in zip(parts, _CRON_FIELDS)]
+
+        # Sunday may be either 0 or 7
+        if masks[4] & 0x80:
+            masks[4] = (masks[4] | 1) & 0x7f
+
+        self.minutes, self.hours, self.days, self.months, self.weekdays = \
+            masks
+
+        # A day matches both day fields unless both are restricted, in
+        # which case it matches either of them
+        self._any_day = parts[2].startswith("*")
+        self._any_weekday = parts[4].startswith("*")
+        self._either = not (self._any_day or self._any_weekday)
+        self._key = (self.minutes, self.hours, self.days, self.months,
+                     self.weekdays, self._either)
+
+        # Every month has days 1-29 at least once in a while
+        if self._any_weekday and not self.days & ((2 << 29) - 2) and \
+           not [x for x in range(1, 13) if self.months >> x & 1 and
+                self.days & ((2 << _DAYS_IN_MONTH[1][x]) - 2)]:
+            raise ValueError("Cron expression %r never matches!" % expression)
+
+    def __repr__(self):
+        return "CronExpression(%r)" % self.expression
+
+    @staticmethod
+    def _parse_field(text, field):
+        """
+            Parse a field into a bitset of its values.
+        """
+        name, lowest, highest, names = field
+
+        # A * day of the week is 0-6 so that Sunday is only set once
+        last = 6 if name == "day of the week" else highest
+
+        if text == "*":
+            return (2 << last) - (1 << lowest)
+        elif text.isdigit() and lowest <= int(text) <= highest:
+            return 1 << int(text)
+
+        mask = 0
+
+        for item in text.lower().split(","):
+            value, slash, step = item.partition("/")
+            try:
+                step = int(step) if slash else 1
+                if value == "*":
+                    start, end = lowest, last
+                else:
+                    start, dash, end = value.partition("-")
+                    start = CronExpression._parse_value(start, field)
+                    if dash:
+                        end = CronExpression._parse_value(end, field)
+                    elif slash:
+                        end = highest
+                    else:
+                        end = start
+            except ValueError:
+                raise ValueError("Invalid cron %s %r!" % (name, item))
+
+            if step < 1 or start > end:
+                raise ValueError("Invalid cron %s %r!" % (name, item))
+
+            for bit in range(start, end + 1, step):
+                mask |= 1 << bit
+
+        return mask
+
+    @staticmethod
+    def _parse_value(text, field):
+        name, lowest, highest, names = field
+
+        if names and text in names:
+            value = names.index(text) + lowest
+        else:
+            value = int(text)
+
+        if not lowest <= value <= highest:
+            raise ValueError()
+
+        return value
+
+    def _get_day_mask(self, year, month):
+        """
+            Get the bitset of the matching days of a month.
+        """
+        length = _days_in_month(year, month)
+        valid = (2 << length) - 2
+
+        # Days of the week of the month as a bitset from day 1, where cron
+        # weekdays start on Sunday and 1970-01-01 was a Thursday
+        first = (_civil_to_days(year, month, 1) + 4) % 7
+        week = ((self.weekdays >> first) |
+                (self.weekdays << (7 - first))) & 0x7f
+        weekdays = (week * _CRON_WEEKS) << 1
+
+        if self._either:
+            return (self.days | weekdays) & valid
+        return self.days & weekdays & valid
+
+    @staticmethod
+    def _split_ticks(ticks, before):
+        """
+            Split the minute after (or before) ticks into (year, month, day,
+            hour, minute).
+        """
+        if before:
+            minutes = (ticks - 1) // _US_PER_MINUTE
+        else:
+            minutes = ticks // _US_PER_MINUTE + 1
+
+        days, minute = divmod(minutes, 1440)
+        hour, minute = divmod(minute, 60)
+        year, month, day = _days_to_civil(days)
+        return year, month, day, hour, minute
+
+    def _next_ticks(self, year, month, day, hour, minute):
+        """
+            Get the ticks of the first match at or after a time, or None.
+        """
+        while year <= 9999:
+            if not self.months >> month & 1:
+                month = _next_bit(self.months, month)
+                if month is None:
+                    year += 1
+                    month = _next_bit(self.months, 1)
+                day = 1
+                hour = minute = 0
+
+            found = _next_bit(self._get_day_mask(year, month), day)
+            if found is None:
+                month += 1
+                day = 1
+                hour = minute = 0
+                continue
+            elif found != day:
+                day = found
+                hour = minute = 0
+
+            found = _next_bit(self.hours, hour)
+            if found is None:
+                day += 1
+                hour = minute = 0
+                continue
+            elif found != hour:
+                hour = found
+                minute = 0
+
+            found = _next_bit(self.minutes, minute)
+            if found is None:
+                hour += 1
+                minute = 0
+                continue
+
+            return ((_civil_to_days(year, month, day) * 24 + hour) * 60 +
+                    found) * _US_PER_MINUTE
+
+        return None
+
+    def _prev_ticks(self, year, month, day, hour, minute):
+        """
+            Get the ticks of the last match at or before a time, or None.
+        """
+        while year >= 1:
+            if not self.months >> month & 1:
+                month = _prev_bit(self.months, month)
+                if month is None:
+                    year -= 1
+                    month = _prev_bit(self.months, 12)
+                day = 31
+                hour = 23
+                minute = 59
+
+            found = _prev_bit(self._get_day_mask(year, month), day)
+            if found is None:
+                month -= 1
+                day = 31
+                hour = 23
+                minute = 59
+                continue
+            elif found != day:
+                day = found
+                hour = 23
+                minute = 59
+
+            found = _prev_bit(self.hours, hour)
+            if found is None:
+                day -= 1
+                hour = 23
+                minute = 59
+                continue
+            elif found != hour:
+                hour = found
+                minute = 59
+
+            found = _prev_bit(self.minutes, minute)
+            if found is None:
+                hour -= 1
+                minute = 59
+                continue
+
+            return ((_civil_to_days(year, month, day) * 24 + hour) * 60 +
+                    found) * _US_PER_MINUTE
+
+        return None
+
+    def matches(self, value):
+        """
+            Get whether a date is a matching time, ignoring seconds.
+
+                >>> CronExpression("*/15 * * * *").matches(Date(1234567890))
+                False
+
+            @type value: Date or anything L{Date} accepts
+            @param value: The date to check
+            @rtype: bool
+            @return: Whether the expression matches the date
+        """
+        ticks = _to_ticks(value)
+        ticks -= ticks % _US_PER_MINUTE
+        return self._next_ticks(*self._split_ticks(ticks - 1, False)) == ticks
+
+    def next_after(self, value):
+        """
+            Get the first matching time after a date.
+
+            @type value: Date or anything L{Date} accepts
+            @param value: The date to search after
+            @rtype: Date or None
+            @return: The next matching time or None if there is none
+        """
+        ticks = self._next_ticks(*self._split_ticks(_to_ticks(value), False))
+        return None if ticks is None else Date.from_ticks(ticks)
+
+    def prev_before(self, value):
+        """
+            Get the last matching time before a date.
+
+            @type value: Date or anything L{Date} accepts
+            @param value: The date to search before
+            @rtype: Date or None
+            @return: The previous matching time or None if there is none
+        """
+        ticks = self._prev_ticks(*self._split_ticks(_to_ticks(value), True))
+        return None if ticks is None else Date.from_ticks(ticks)
+
+def _to_ticks(value):
+    if isinstance(value, Date):
+        return value.ticks
+    elif type(value) is datetime:
+        return _datetime_to_ticks(value)
+    else:
+        return _datetime_to_ticks(Date(value).dt)
+
+def _to_delta_ticks(value):
+    if isinstance(value, Delta):
+        return value._us
+    elif isinstance(value, timedelta):
+        return _timedelta_to_ticks(value)
+    else:
+        return _to_microseconds(value, _US_PER_SECOND)
+
+def _get_interval(interval, origin):
+    """
+        Get the length of an interval and the ticks of its origin for
+        rounding dates, see L{Date.floor}.
+    """
+    step = _to_delta_ticks(interval)
+    if step <= 0:
+        raise ValueError("The interval must be positive!")
+
+    return step, 0 if origin is None else _to_ticks(origin)
+
+def _check_ticks(ticks):
+    if ticks and not (_MIN_TICKS <= min(ticks) and max(ticks) <= _MAX_TICKS):
+        raise OverflowError("date value out of range")
+    return ticks
+
+
+# Regular expressions for the strptime directives which DateParser compiles
+# itself, taken from the _strptime module so that both accept the same input.
+_DIRECTIVE_PATTERNS = {
+    "d": r"(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])",
+    "f": r"([0-9]{1,6})",
+    "H": r"(2[0-3]|[0-1]\d|\d)",
+    "I": r"(1[0-2]|0[1-9]|[1-9])",
+    "j": r"(36[0-6]|3[0-5]\d|[1-2]\d\d|0[1-9]\d|00[1-9]|[1-9]\d|0[1-9]|[1-9])",
+    "m": r"(1[0-2]|0[1-9]|[1-9])",
+    "M": r"([0-5]\d|\d)",
+    "S": r"(6[0-1]|[0-5]\d|\d)",
+    "y": r"(\d\d)",
+    "Y": r"(\d\d\d\d)",
+}
+
+def _parse_short_year(text):
+    year = int(text)
+    return year + (2000 if year <= 68 else 1900)
+
+def _parse_fraction(text):
+    return int(text + "0" * (6 - len(text)))
+
+# Where each directive stores its value in the list of fields passed to
+# datetime(...), and how to convert it. Slots past the microsecond hold the
+# 12-hour clock, am/pm and day of the year until they are resolved.
+_DIRECTIVE_SLOTS = {
+    "Y": (0, int), "y": (0, _parse_short_year), "m": (1, int), "d": (2, int),
+    "H": (3, int), "M": (4, int), "S": (5, int), "f": (6, _parse_fraction),
+    "I": (7, int), "j": (9, int),
+}
+
+_FORMAT_CACHE_SIZE = 128
+_format_cache = {}
+
+# Directives whose text depends on the LC_TIME locale
+_LOCALE_DIRECTIVES = ("%a", "%A", "%b", "%B", "%h", "%p")
+
+def _get_cache_key(format):
+    """
+        Get the key to cache a compiled format under. Formats using month,
+        weekday or am/pm names are compiled once per locale, so that they
+        follow later calls to locale.setlocale(...).
+    """
+    for directive in _LOCALE_DIRECTIVES:
+        if directive in format:
+            return format, locale.setlocale(locale.LC_TIME)
+
+    return format
+
+def compile_format(format):
+    """
+        Get a compiled L{DateParser} for a strptime format. Parsers are
+        cached per format string, and per locale if the format uses names,
+        so that each format is only analyzed once.
+        The special format "iso" gives a parser for ISO 8601 / RFC 3339
+        strings, see L{Date.from_iso}, and "auto" gives a new
+        L{FormatSniffer} which detects the format of the values it parses.
+
+            >>> compile_format("%Y-%m-%d") is compile_format("%Y-%m-%d")
+            True
+            >>> compile_format("iso").parse("2009-02-14T00:31:30")
+            datetime.datetime(2009, 2, 14, 0, 31, 30)
+            >>> compile_format("auto").parse("14.02.2009")
+            datetime.datetime(2009, 2, 14, 0, 0)
+
+        @type format: str
+        @param format: The format description, see datetime.strptime(...)
+        @rtype: DateParser or FormatSniffer
+        @return: The parser for format
+    """
+    if format == "iso":
+        return _iso_parser
+    elif format == "auto":
+        # Sniffers lock onto the format of their values, so they can't be
+        # shared
+        return FormatSniffer()
+
+    key = _get_cache_key(format)
+
+    try:
+        return _format_cache[key]
+    except KeyError:
+        if len(_format_cache) >= _FORMAT_CACHE_SIZE:
+            _format_cache.clear()
+        parser = _format_cache[key] = DateParser(format)
+        return parser
+
+
+class DateParser(object):
+    """
+        A strptime format compiled into a specialized parser. The format is
+        only analyzed once into a single regular expression, after which each
+        string is decoded with one match and a direct int conversion per
+        field. Formats using directives other than %Y %y %m %d %j %H %I %p
+        %M %S %f %b %B %h and %% are handed to datetime.strptime instead.
+
+        Month and am/pm names are taken from the locale active when the
+        format is compiled. Use L{compile_format} to get a cached parser
+        for the current locale.
+
+            >>> parser = compile_format("%Y-%m-%d %H:%M:%S")
+            >>> parser.parse("2009-02-14 00:31:30")
+            datetime.datetime(2009, 2, 14, 0, 31, 30)
+            >>> parser.parse("2009-2-14 0:31:30")
+            datetime.datetime(2009, 2, 14, 0, 31, 30)
+            >>> parser.parse("2009-02-14")
+            Traceback (most recent call last):
+                ...
+            ValueError: time data '2009-02-14' does not match format '%Y-%m-%d %H:%M:%S'
+
+            >>> compile_format("%d %b %Y, %I:%M %p").parse("14 feb 2009, 12:31 AM")
+            datetime.datetime(2009, 2, 14, 0, 31)
+            >>> compile_format("%Y-%j").parse("2009-045")
+            datetime.datetime(2009, 2, 14, 0, 0)
+
+        @type format: str
+        @param format: The format description, see datetime.strptime(...)
+    """
+    def __init__(self, format):
+        self.format = format
+        self._regex = None
+        self._slots = []
+        self._names = {}
+        self._resolve = False
+
+        tokens = self._tokenize(format)
+        if tokens is None:
+            return
+
+        pattern = []
+
+        for code, text in tokens:
+            if code is None:
+                for chunk in re.findall(r"\s+|\S+", text):
+                    if chunk.isspace():
+                        pattern.append(r"\s+")
+                    else:
+                        pattern.append(re.escape(chunk))
+            elif code in _DIRECTIVE_SLOTS:
+                pattern.append(_DIRECTIVE_PATTERNS[code])
+                self._slots.append(_DIRECTIVE_SLOTS[code])
+            else:
+                names = self._get_names(code)
+                if not all(names):
+                    return
+                pattern.append("(%s)" % "|".join([re.escape(x) for x in
+                                          sorted(names, key=len, reverse=True)]))
+                if code == "p":
+                    self._names.update([(x.lower(), i) for i, x in
+                                        enumerate(names)])
+                    self._slots.append((8, self._get_name))
+                else:
+                    self._names.update([(x.lower(), i + 1) for i, x in
+                                        enumerate(names)])
+                    self._slots.append((1, self._get_name))
+
+            if code in ("I", "j"):
+                self._resolve = True
+
+        self._regex = re.compile("".join(pattern), re.IGNORECASE)
+
+    @staticmethod
+    def _tokenize(format):
+        """
+            Split a format into (directive, None) and (None, literal) tuples.
+            Returns None if the format uses any directive which is not
+            compiled by this class.
+        """
+        tokens = []
+        literal = ""
+        index = 0
+
+        while index < len(format):
+            char = format[index]
+
+            if char == "%" and index + 1 < len(format):
+                code = format[index + 1]
+                index += 2
+
+                if code == "%":
+                    literal += "%"
+                    continue
+                elif code not in _DIRECTIVE_SLOTS and code not in "bBhp":
+                    return None
+
+                if literal:
+                    tokens.append((None, literal))
+                    literal = ""
+                tokens.append((code, None))
+            elif char == "%":
+                return None
+            else:
+                literal += char
+                index += 1
+
+        if literal:
+            tokens.append((None, literal))
+
+        return tokens
+
+    @staticmethod
+    def _get_names(code):
+        if code == "p":
+            return [time.strftime("%p", (2000, 1, 1, hour, 0, 0, 5, 1, -1))
+                    for hour in (1, 13)]
+        elif code == "B":
+            return list(calendar.month_name[1:])
+        else:
+            return list(calendar.month_abbr[1:])
+
+    def _get_name(self, text):
+        return self._names[text.lower()]
+
+    def parse(self, value):
+        """
+            Parse a string into a datetime.
+
+            @type value: str
+            @param value: The string to parse
+            @rtype: datetime
+            @return: The parsed date/time
+            @raise ValueError: If value does not match the format
+        """
+        if self._regex is None:
+            return datetime.strptime(value, self.format)
+
+        match = self._regex.match(value)
+
+        if match is None:
+            raise ValueError("time data %r does not match format %r" %
+                             (value, self.format))
+        elif match.end() != len(value):
+            raise ValueError("unconverted data remains: %s" %
+                             value[match.end():])
+
+        fields = [1900, 1, 1, 0, 0, 0, 0, None, 0, None]
+
+        for (slot, convert), text in zip(self._slots, match.groups()):
+            fields[slot] = convert(text)
+
+        if self._resolve:
+            if fields[7] is not None:
+                # Both 12 AM and a 12 without any am/pm are midnight
+                fields[3] = fields[7] % 12 + fields[8] * 12
+            if fields[9] is not None:
+                value = date.fromordinal(date(fields[0], 1, 1).toordinal() +
+                                         fields[9] - 1)
+                fields[:3] = value.year, value.month, value.day
+
+        return datetime(*fields[:7])
+
+    def parse_ticks(self, value):
+        """
+            Parse a string into ticks as stored by a L{DateArray}.
+
+            @type value: str
+            @param value: The string to parse
+            @rtype: int
+            @return: Microseconds of wall-clock time since 1970-01-01
+            @raise ValueError: If value does not match the format
+        """
+        return _datetime_to_ticks(self.parse(value))
+
+    def parse_many(self, values):
+        """
+            Parse a number of strings into a L{DateArray}.
+
+                >>> compile_format("%Y-%m-%d").parse_many(["2009-02-14", "2010-01-01"])
+                DateArray([Date(2009-02-14, 00:00:00), Date(2010-01-01, 00:00:00)])
+
+            @type values: iterable
+            @param values: The strings to parse
+            @rtype: DateArray
+            @return: The parsed dates
+            @raise ValueError: If any value does not match the format
+        """
+        parse_ticks = self.parse_ticks
+        return DateArray.from_ticks(array(_TICK_TYPECODE,
+                                          [parse_ticks(x) for x in values]))
+
+def _utc_ticks_to_local(ticks):
+    seconds, microseconds = divmod(ticks, _US_PER_SECOND)
+    return _local_zone.to_local(seconds) * _US_PER_SECOND + microseconds
+
+# ISO 8601 / RFC 3339 dates and date/times in extended format
+_ISO_REGEX = re.compile(r"(\d\d\d\d)-(\d\d)-(\d\d)"
+                        r"(?:[Tt ](\d\d):(\d\d)(?::(\d\d)(?:[.,](\d+))?)?"
+                        r"(?:([Zz])|([+-])([01]\d|2[0-3])(?::?([0-5]\d))?)?)?\Z")
+
+def _parse_iso(value):
+    """
+        Split an ISO 8601 / RFC 3339 date or date and time in extended
+        format into (year, month, day, hour, minute, second, microsecond,
+        offset) where offset is the UTC offset in seconds or None if the
+        string has no offset. Fractions beyond microseconds are truncated.
+    """
+    match = _ISO_REGEX.match(value)
+
+    if match is None:
+        raise ValueError("Invalid ISO 8601 date/time: %r" % value)
+
+    year, month, day, hour, minute, second, fraction, utc, sign, \
+        offset_hours, offset_minutes = match.groups()
+
+    if hour is None:
+        return int(year), int(month), int(day), 0, 0, 0, 0, None
+
+    if fraction:
+        microsecond = int((fraction[:6] + "00000")[:6])
+    else:
+        microsecond = 0
+
+    if utc:
+        offset = 0
+    elif sign:
+        offset = int(offset_hours) * 3600 + int(offset_minutes or 0) * 60
+        if sign == "-":
+            offset = -offset
+    else:
+        offset = None
+
+    return (int(year), int(month), int(day), int(hour), int(minute),
+            int(second or 0), microsecond, offset)
+
+def _iso_to_ticks(value):
+    year, month, day, hour, minute, second, microsecond, offset = \
+        _parse_iso(value)
+
+    ticks = _datetime_to_ticks(datetime(year, month, day, hour, minute,
+                                        second, microsecond))
+
+    if offset is not None:
+        ticks = _utc_ticks_to_local(ticks - offset * _US_PER_SECOND)
+
+        # The offset may move a date just outside the range of datetime
+        if not _MIN_TICKS <= ticks <= _MAX_TICKS:
+            raise OverflowError("date value out of range")
+
+    return ticks
+
+def _iso_to_datetime(value):
+    fields = _parse_iso(value)
+
+    if fields[7] is None:
+        return datetime(*fields[:7])
+
+    return _ticks_to_datetime(_iso_to_ticks(value))
+
+class _IsoParser(DateParser):
+    """
+        A L{DateParser} for ISO 8601 / RFC 3339 strings.
+    """
+    def __init__(self):
+        self.format = "iso"
+
+    def parse(self, value):
+        return _iso_to_datetime(value)
+
+    def parse_ticks(self, value):
+        return _iso_to_ticks(value)
+
+_iso_parser = _IsoParser()
+
+# Formats tried by FormatSniffer, in order of preference
+DEFAULT_FORMATS = (
+    "iso",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y",
+    "%d %b %Y %H:%M:%S",
+    "%d %b %Y",
+    "%b %d %Y %H:%M:%S",
+    "%b %d, %Y",
+    "%d/%b/%Y:%H:%M:%S",
+    "%Y%m%d%H%M%S",
+    "%Y%m%d",
+)
+
+class FormatSniffer(object):
+    """
+        Detects the format of a stream of date strings once and then parses
+        the rest of the stream with the compiled parser for that format.
+        Only when a value does not match is the format detected again, so
+        a stream pays the cost of trying every known format only when its
+        format changes.
+
+        When detecting from a number of values the format matching most of
+        them wins, which e.g. tells days and months apart. Ties go to the
+        format listed first.
+
+            >>> sniffer = FormatSniffer()
+            >>> sniffer.parse_many(["01/02/2009", "02/28/2009"])
+            DateArray([Date(2009-01-02, 00:00:00), Date(2009-02-28, 00:00:00)])
+            >>> sniffer.format
+            '%m/%d/%Y'
+            >>> sniffer.parse("2009-02-14T00:31:30")
+            datetime.datetime(2009, 2, 14, 0, 31, 30)
+            >>> sniffer.format
+            'iso'
+
+        @type formats: list
+        @param formats: Formats to choose from, see L{compile_format};
+                        defaults to L{DEFAULT_FORMATS}
+        @type sample_size: int
+        @param sample_size: The number of values to inspect when detecting
+                            the format of a stream in L{parse_many}
+    """
+    def __init__(self, formats = None, sample_size = 10):
+        if formats is None:
+            formats = DEFAULT_FORMATS
+
+        self.formats = list(formats)
+        self.sample_size = sample_size
+        self.parser = None
+
+    @property
+    def format(self):
+        """
+            Get the currently detected format.
+
+            @rtype: str
+            @return: The detected format or None if nothing was detected yet
+        """
+        if self.parser is None:
+            return None
+
+        return self.parser.format
+
+    def sniff(self, values):
+        """
+            Detect the format of some sample values and lock onto it.
+
+                >>> FormatSniffer().sniff(["14.02.2009", "garbage"])
+                '%d.%m.%Y'
+
+            @type values: list
+            @param values: The sample strings
+            @rtype: str
+            @return: The detected format
+            @raise ValueError: If none of the formats matches any value
+        """
+        best = None
+        best_count = 0
+
+        for format in self.formats:
+            parser = compile_format(format)
+            count = 0
+
+            for value in values:
+                try:
+                    parser.parse(value)
+                    count += 1
+                except ValueError:
+                    pass
+
+            if count > best_count:
+                best, best_count = parser, count
+                if count == len(values):
+                    break
+
+        if best is None:
+            raise ValueError("Unable to detect the date format of %r" %
+                             (values[:3],))
+
+        self.parser = best
+        return best.format
+
+    def parse(self, value):
+        """
+            Parse a single string, detecting its format if needed.
+
+            @type value: str
+            @param value: The string to parse
+            @rtype: datetime
+            @return: The parsed date/time
+            @raise ValueError: If none of the formats matches value
+        """
+        if self.parser is not None:
+            try:
+                return self.parser.parse(value)
+            except ValueError:
+                pass
+
+        self.sniff([value])
+        return self.parser.parse(value)
+
+    def parse_ticks(self, value):
+        """
+            Parse a single string into ticks as stored by a L{DateArray},
+            detecting its format if needed.
+
+            @type value: str
+            @param value: The string to parse
+            @rtype: int
+            @return: Microseconds of wall-clock time since 1970-01-01
+            @raise ValueError: If none of the formats matches value
+        """
+        if self.parser is not None:
+            try:
+                return self.parser.parse_ticks(value)
+            except ValueError:
+                pass
+
+        self.sniff([value])
+        return self.parser.parse_ticks(value)
+
+    def parse_many(self, values):
+        """
+            Parse a number of strings into a L{DateArray}. If no format has
+            been detected yet, the first sample_size values are used to
+            detect it.
+
+            @type values: iterable
+            @param values: The strings to parse
+            @rtype: DateArray
+            @return: The parsed dates
+            @raise ValueError: If none of the formats matches a value
+        """
+        values = iter(values)
+        sample = list(itertools.islice(values, self.sample_size))
+
+        if self.parser is None and sample:
+            self.sniff(sample)
+
+        parse_ticks = self.parse_ticks
+        ticks = array(_TICK_TYPECODE, [parse_ticks(x) for x in sample])
+        ticks.extend([parse_ticks(x) for x in values])
+
+        return DateArray.from_ticks(ticks)
+
+def iter_parse(fileobj, format, column = None, delimiter = None,
+               chunk_size = 1024 * 1024, arrays = False):
+    """
+        Parse the dates in a line-oriented file. The file is read in large
+        chunks and the dates of each chunk are parsed in one batch, so that
+        memory use stays bounded no matter how large the file is. Blank
+        lines are skipped.
+
+            >>> from io import BytesIO
+            >>> log = BytesIO(b"2009-02-14 00:31:30 GET /\\n"
+            ...                b"2009-02-15 10:00:00 GET /about\\n")
+            >>> for d in iter_parse(log, "%Y-%m-%d %H:%M:%S", column=slice(0, 19)):
+            ...     print(d)
+            Date(2009-02-14, 00:31:30)
+            Date(2009-02-15, 10:00:00)
+
+            >>> csv = BytesIO(b"a,2009-02-14\\nb,2009-02-15\\n")
+            >>> list(iter_parse(csv, "iso", column=1, delimiter=",", arrays=True))
+            [DateArray([Date(2009-02-14, 00:00:00), Date(2009-02-15, 00:00:00)])]
+
+        @type fileobj: file
+        @param fileobj: A file-like object opened in text or binary mode
+        @type format: str
+        @param format: The format of the dates, see L{compile_format}; may
+                       also be "auto" to detect it, see L{FormatSniffer}
+        @type column: int, slice or None
+        @param column: The field holding the date if an int, the part of
+                       each line holding it if a slice, or None to use the
+                       whole line
+        @type delimiter: str or None
+        @param delimiter: The field delimiter when column is an int; None
+                          splits on whitespace
+        @type chunk_size: int
+        @param chunk_size: The number of bytes or characters to read at once
+        @type arrays: bool
+        @param arrays: Whether to yield a L{DateArray} per chunk instead of
+                       single L{Date}s
+        @rtype: generator
+        @return: Parsed L{Date}s or L{DateArray}s
+        @raise ValueError: If a date does not match the format
+    """
+    parser = compile_format(format)
+
+    if column is None:
+        extract = lambda line: line.strip()
+    elif isinstance(column, slice):
+        extract = lambda line: line[column].strip()
+    else:
+        extract = lambda line: line.split(delimiter)[column].strip()
+
+    rest = None
+
+    while True:
+        chunk = fileobj.read(chunk_size)
+
+        if rest is None:
+            rest = chunk[:0]
+            newline = b"\n" if isinstance(chunk, bytes) else "\n"
+
+        if chunk:
+            # Only parse complete lines, keeping the rest for the next chunk
+            chunk = rest + chunk
+            end = chunk.rfind(newline) + 1
+            lines, rest = chunk[:end], chunk[end:]
+        else:
+            lines = rest
+
+        if isinstance(lines, bytes):
+            lines = lines.decode("utf-8")
+
+        values = [extract(line) for line in lines.splitlines()
+                  if line.strip()]
+
+        if arrays:
+            if values:
+                yield parser.parse_many(values)
+        else:
+            parse = parser.parse
+            for value in values:
+                yield Date(parse(value))
+
+        if not chunk:
+            break
+
+def read_csv_column(filename, column, format = "iso", delimiter = ",",
+                    header = False):
+    """
+        Read a single column of dates from a CSV file into a L{DateArray}.
+        The file is memory-mapped and scanned for line breaks and
+        delimiters, so only the bytes of the requested field are ever
+        copied out of it rather than every row. Quoted fields are supported
+        as long as no delimiters are quoted before the date column.
+
+            >>> import os, tempfile
+            >>> fd, filename = tempfile.mkstemp()
+            >>> _ = os.write(fd, b"id,created\\n1,2009-02-14 00:31:30\\n"
+            ...                  b"   \\n2,\\"2009-02-15 10:00:00\\"\\n")
+            >>> os.close(fd)
+            >>> read_csv_column(filename, 1, header=True)
+            DateArray([Date(2009-02-14, 00:31:30), Date(2009-02-15, 10:00:00)])
+            >>> os.remove(filename)
+
+        @type filename: str
+        @param filename: The path of the CSV file
+        @type column: int
+        @param column: The index of the column holding the dates
+        @type format: str
+        @param format: The format of the dates, see L{compile_format}; may
+                       also be "auto" to detect it, see L{FormatSniffer}
+        @type delimiter: str
+        @param delimiter: The field delimiter
+        @type header: bool
+        @param header: Whether to skip the first line
+        @rtype: DateArray
+        @return: The dates of the column
+        @raise ValueError: If a row has too few columns or a date does not
+                           match the format
+    """
+    parse_ticks = compile_format(format).parse_ticks
+    ticks = array(_TICK_TYPECODE)
+
+    if not isinstance(delimiter, bytes):
+        delimiter = delimiter.encode("ascii")
+
+    with open(filename, "rb") as fileobj:
+        if os.fstat(fileobj.fileno()).st_size == 0:
+            return DateArray()
+
+        data = mmap.mmap(fileobj.fileno(), 0, access = mmap.ACCESS_READ)
+
+        try:
+            size = len(data)
+            pos = 0
+            row = 0
+
+            if header:
+                pos = data.find(b"\n") + 1 or size
+
+            while pos < size:
+                row += 1
+                end = data.find(b"\n", pos)
+                if end == -1:
+                    end = size
+
+                if not data[pos:end].strip():
+                    # Blank line, including whitespace-only ones
+                    pos = end + 1
+                    continue
+
+                start = pos
+                for x in range(column):
+                    start = data.find(delimiter, start, end)
+                    if start == -1:
+                        raise ValueError("Row %d has no column %d!" %
+                                         (row + bool(header), column))
+                    start += 1
+
+                stop = data.find(delimiter, start, end)
+                if stop == -1:
+                    stop = end
+
+                field = data[start:stop].strip().strip(b'"')
+                ticks.append(parse_ticks(field.decode("ascii")))
+                pos = end + 1
+        finally:
+            data.close()
+
+    return DateArray.from_ticks(ticks)
+
+
+# Zero-padded strings of the numbers 0-99
+_PADDED = ["%02d" % x for x in range(100)]
+
+def _get_day_of_year(dt):
+    return dt.toordinal() - date(dt.year, 1, 1).toordinal() + 1
+
+# The printf-style conversion and the datetime attribute, or a function of
+# the datetime, rendering each numeric strftime directive which
+# DateFormatter handles itself. %Y is not zero-padded, like the C library
+# on Linux.
+_STRFTIME_FIELDS = {
+    "Y": ("%d", "year"),
+    "y": ("%02d", lambda dt: dt.year % 100),
+    "m": ("%02d", "month"),
+    "d": ("%02d", "day"),
+    "e": ("%2d", "day"),
+    "j": ("%03d", _get_day_of_year),
+    "w": ("%d", lambda dt: dt.isoweekday() % 7),
+    "H": ("%02d", "hour"),
+    "I": ("%02d", lambda dt: (dt.hour + 11) % 12 + 1),
+    "M": ("%02d", "minute"),
+    "S": ("%02d", "second"),
+}
+
+_strftime_cache = {}
+
+def compile_strftime(format):
+    """
+        Get a compiled L{DateFormatter} for a strftime format. Formatters
+        are cached per format string, and per locale if the format uses
+        names, so that each format is only analyzed once.
+
+            >>> compile_strftime("%Y-%m-%d") is compile_strftime("%Y-%m-%d")
+            True
+
+        @type format: str
+        @param format: The format string, see time.strftime(...)
+        @rtype: DateFormatter
+        @return: The formatter for format
+    """
+    key = _get_cache_key(format)
+
+    try:
+        return _strftime_cache[key]
+    except KeyError:
+        if len(_strftime_cache) >= _FORMAT_CACHE_SIZE:
+            _strftime_cache.clear()
+        formatter = _strftime_cache[key] = DateFormatter(format)
+        return formatter
+
+def format_many(dates, format):
+    """
+        Convert a number of dates to strings using the same format. See
+        L{DateFormatter.format_many}.
+
+            >>> format_many([Date(0), datetime(2009, 2, 14)], "%d/%m/%Y")
+            ['01/01/1970', '14/02/2009']
+
+        @type dates: DateArray or iterable
+        @param dates: The dates to convert
+        @type format: str
+        @param format: The format string, see time.strftime(...)
+        @rtype: list
+        @return: The string representation of each date
+    """
+    return compile_strftime(format).format_many(dates)
+
+
+class DateFormatter(object):
+    """
+        A strftime format compiled into a printf-style template and the
+        attributes or functions giving its fields. The format is only
+        analyzed once, and rendering a date needs neither a struct_time nor
+        a call into the C library; formats made only of plain attributes
+        such as %Y-%m-%d %H:%M:%S fetch all their fields in a single call.
+        Formats using directives other than %Y %y %m %d %e %j %w %H %I %M
+        %S %p %a %A %b %B %h and %% are handed to time.strftime instead.
+
+        Month, weekday and am/pm names are taken from the locale active
+        when the format is compiled. Use L{compile_strftime} to get a
+        cached formatter for the current locale.
+
+            >>> formatter = compile_strftime("%a %d %b %Y, %I:%M %p")
+            >>> formatter.format(datetime(2009, 2, 14, 0, 31, 30))
+            'Sat 14 Feb 2009, 12:31 AM'
+            >>> compile_strftime("%j %y %e %%").format(datetime(905, 2, 3))
+            '034 05  3 %'
+
+        @type format: str
+        @param format: The format string, see time.strftime(...)
+    """
+    def __init__(self, format):
+        self.format_string = format
+        self._render = None
+
+        template = []
+        getters = []
+        index = 0
+
+        while index < len(format):
+            char = format[index]
+
+            if char != "%":
+                template.append(char)
+                index += 1
+                continue
+            elif index + 1 == len(format):
+                return
+
+            code = format[index + 1]
+            index += 2
+
+            if code == "%":
+                template.append("%%")
+            elif code in _STRFTIME_FIELDS:
+                conversion, getter = _STRFTIME_FIELDS[code]
+                template.append(conversion)
+                getters.append(getter)
+            elif code in "paAbBh":
+                template.append("%s")
+                getters.append(self._get_name_field(code))
+            else:
+                return
+
+        template = "".join(template)
+
+        if not getters:
+            self._render = lambda dt: template % ()
+        elif all(isinstance(getter, str) for getter in getters):
+            # Only plain attributes, fetched together in a single call
+            get_values = operator.attrgetter(*getters)
+
+            if len(getters) == 1:
+                self._render = lambda dt: template % (get_values(dt),)
+            else:
+                self._render = lambda dt: template % get_values(dt)
+        else:
+            getters = [operator.attrgetter(getter)
+                       if isinstance(getter, str) else getter
+                       for getter in getters]
+
+            def render(dt):
+                return template % tuple([get(dt) for get in getters])
+
+            self._render = render
+
+    @staticmethod
+    def _get_name_field(code):
+        """
+            Get a function rendering a name directive in the current locale.
+        """
+        if code == "p":
+            names = DateParser._get_names("p")
+            return lambda dt: names[dt.hour >= 12]
+        elif code == "a":
+            names = list(calendar.day_abbr)
+        elif code == "A":
+            names = list(calendar.day_name)
+        elif code == "B":
+            names = list(calendar.month_name)
+        else:
+            names = list(calendar.month_abbr)
+
+        if code in "aA":
+            return lambda dt: names[dt.weekday()]
+        return lambda dt: names[dt.month]
+
+    def format(self, dt):
+        """
+            Convert a datetime to a string.
+
+            @type dt: datetime
+            @param dt: The date/time to convert
+            @rtype: str
+            @return: The string representation of dt
+        """
+        if self._render is None:
+            return time.strftime(self.format_string, dt.timetuple())
+
+        return self._render(dt)
+
+    def format_many(self, dates):
+        """
+            Convert a number of dates to strings.
+
+                >>> a = DateArray([Date(0), Date(1234567890)])
+                >>> compile_strftime("%Y-%m-%d").format_many(a)
+                ['1970-01-01', '2009-02-14']
+
+            @type dates: DateArray or iterable
+            @param dates: L{DateArray} or Date or datetime objects
+            @rtype: list
+            @return: The string representation of each date
+        """
+        if isinstance(dates, DateArray):
+            to_datetime = _ticks_to_datetime
+            values = [to_datetime(t) for t in dates.ticks]
+        else:
+            values = [x.dt if isinstance(x, Date) else x for x in dates]
+
+        if self._render is None:
+            return [time.strftime(self.format_string, x.timetuple())
+                    for x in values]
+
+        return [self._render(x) for x in values]
+
+
+def sql_many(dates):
+    """
+        Get the SQL-friendly representation of a number of dates, see
+        L{Date.sql}.
+
+            >>> sql_many(DateArray([Date(1234567890), Date(0)]))
+            ["'2009-02-14 00:31:30'", "'1970-01-01 01:00:00'"]
+
+        @type dates: DateArray or iterable
+        @param dates: L{DateArray} or Date or datetime objects
+        @rtype: list
+        @return: SQL-friendly representation of each date/time
+    """
+    return format_many(dates, "'%Y-%m-%d %H:%M:%S'")
+
+# Header and trailer of PostgreSQL's binary COPY format
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+
+# PostgreSQL counts timestamps in microseconds since 2000-01-01
+_PG_EPOCH_TICKS = _datetime_to_ticks(datetime(2000, 1, 1))
+
+_COPY_CHUNK_SIZE = 65536
+
+def write_copy(fileobj, dates, binary = False):
+    """
+        Write dates as a single timestamp column in PostgreSQL COPY format,
+        e.g. for cursor.copy_expert("COPY t (column) FROM STDIN") in
+        psycopg2. Rows are written in chunks, so millions of dates can be
+        exported without building one huge string.
+
+            >>> import io
+            >>> out = io.BytesIO()
+            >>> dates = DateArray([Date(1234567890), datetime(1, 2, 3, 4, 5, 6, 7)])
+            >>> write_copy(out, dates)
+            >>> out.getvalue() == b'2009-02-14 00:31:30\\n0001-02-03 04:05:06.000007\\n'
+            True
+
+            >>> out = io.BytesIO()
+            >>> write_copy(out, DateArray([datetime(2000, 1, 1, 0, 0, 1)]), binary=True)
+            >>> out.getvalue()[19:] == b'\\x00\\x01\\x00\\x00\\x00\\x08\\x00\\x00\\x00\\x00\\x00\\x0fB@\\xff\\xff'
+            True
+
+        @type fileobj: file
+        @param fileobj: A file opened in binary mode to write to
+        @type dates: DateArray or iterable
+        @param dates: L{DateArray} or anything L{DateArray} accepts
+        @type binary: bool
+        @param binary: Whether to use the binary instead of the text format
+    """
+    if not isinstance(dates, DateArray):
+        dates = DateArray(dates)
+
+    ticks = dates.ticks
+
+    if binary:
+        fileobj.write(_PGCOPY_HEADER)
+        row = struct.Struct(">hiq").pack
+        epoch = _PG_EPOCH_TICKS
+
+        for start in range(0, len(ticks), _COPY_CHUNK_SIZE):
+            fileobj.write(b"".join([row(1, 8, t - epoch) for t in
+                              ticks[start:start + _COPY_CHUNK_SIZE]]))
+
+        fileobj.write(_PGCOPY_TRAILER)
+        return
+
+    padded = _PADDED
+    days = {}
+
+    for start in range(0, len(ticks), _COPY_CHUNK_SIZE):
+        lines = []
+
+        for t in ticks[start:start + _COPY_CHUNK_SIZE]:
+            day, microseconds = divmod(t, _US_PER_DAY)
+
+            try:
+                text = days[day]
+            except KeyError:
+                value = _days_to_date(day)
+                text = days[day] = "%04d-%s-%s " % (value.year,
+                                                    padded[value.month],
+                                                    padded[value.day])
+
+            seconds, microseconds = divmod(microseconds, _US_PER_SECOND)
+            minutes, seconds = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            text += padded[hours] + ":" + padded[minutes] + ":" + \
+                    padded[seconds]
+
+            if microseconds:
+                text += ".%06d" % microseconds
+
+            lines.append(text)
+
+        lines.append("")
+        fileobj.write("\n".join(lines).encode("ascii"))
+
+
+def register_sqlite(storage = "iso", date_type = "paodate",
+                    delta_type = "paodelta"):
+    """
+        Register adapters and converters with the sqlite3 module, so that
+        Date and Delta objects can be passed as query parameters (which
+        allows statement caching and executemany batching) and columns
+        declared as date_type or delta_type are returned as Date and Delta
+        objects when connecting with detect_types=sqlite3.PARSE_DECLTYPES.
+
+        Dates are stored either as ISO 8601 text in local time, which
+        keeps microseconds and sorts correctly, or with storage="epoch" as
+        integer Unix timestamps, which drops microseconds. Deltas are
+        always stored as an integer number of microseconds.
+
+            >>> import sqlite3
+            >>> register_sqlite()
+            >>> db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+            >>> _ = db.execute("CREATE TABLE t (d paodate, l paodelta)")
+            >>> _ = db.execute("INSERT INTO t VALUES (?, ?)", (Date(1234567890), Delta(90)))
+            >>> db.execute("SELECT d, l, typeof(d) = 'text' FROM t").fetchone()
+            (Date(2009-02-14, 00:31:30), Delta(1 minute, 30 seconds), 1)
+
+            >>> register_sqlite("epoch")
+            >>> db.execute("SELECT ?", (Date(1234567890),)).fetchone()
+            (1234567890,)
+
+        @type storage: str
+        @param storage: Either "iso" or "epoch"
+        @type date_type: str
+        @param date_type: The declared column type to convert to Date
+        @type delta_type: str
+        @param delta_type: The declared column type to convert to Delta
+        @raise ValueError: If storage is not valid
+    """
+    import sqlite3
+
+    if storage == "iso":
+        adapt_date = lambda value: value.dt.isoformat(" ")
+        convert_date = lambda value: Date.from_ticks(
+                                         _iso_to_ticks(value.decode("ascii")))
+    elif storage == "epoch":
+        adapt_date = lambda value: value.timestamp
+        convert_date = lambda value: Date.from_ticks(
+                                         _timestamp_to_ticks(int(value)))
+    else:
+        raise ValueError("Storage must be 'iso' or 'epoch', not %r!" %
+                         storage)
+
+    # Adapters are looked up by exact type, so subclasses need their own
+    for cls in (Date, FrozenDate):
+        sqlite3.register_adapter(cls, adapt_date)
+
+    sqlite3.register_adapter(Delta, lambda value: value._us)
+    sqlite3.register_converter(date_type, convert_date)
+    sqlite3.register_converter(delta_type, lambda value:
+                                   Delta.from_microseconds(int(value)))
+
+
 """
     ===========================================================================
     Begin relativedelta code
@@ -1753,6 +6152,16 @@ Here is the behavior of operations with relativedelta:
             raise TypeError("unsupported type for add operation")
         elif self._has_time and not isinstance(other, datetime):
             other = datetime.fromordinal(other.toordinal())
+        if not (self.days or self.hours or self.minutes or self.seconds or
+                self.microseconds or self.leapdays or self.weekday or
+                self._has_time or self.year or self.month or self.day):
+            # Fast path for relative years / months only
+            year, month = divmod((other.year + self.years) * 12 +
+                                 other.month - 1 + self.months, 12)
+            month += 1
+            return other.replace(year=year, month=month,
+                                 day=min(other.day,
+                                         _days_in_month(year, month)))
         year = (self.year or other.year)+self.years
         month = self.month or other.month
         if self.months:
@@ -1764,8 +6173,7 @@ Here is the behavior of operations with relativedelta:
             elif month < 1:
                 year -= 1
                 month += 12
-        day = min(calendar.monthrange(year, month)[1],
-                  self.day or other.day)
+        day = min(_days_in_month(year, month), self.day or other.day)
         repl = {"year": year, "month": month, "day": day}
         for attr in ["hour", "minute", "second", "microsecond"]:
             value = getattr(self, attr)